@@ -1,11 +1,18 @@
+import time
 import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
+from http_transport import Transport, get_default_transport
 
-def search_arxiv(query, max_results=10, start_date=None, end_date=None, search_field=None):
+BASE_URL = "http://export.arxiv.org/api/query"
+# arXiv APIの推奨リクエスト間隔（秒）
+REQUEST_DELAY = 3.0
+# Transport以外のセッションを渡されたときのタイムアウト（秒）。TransportはTransport(timeout=...)の値を使う
+REQUEST_TIMEOUT = 10
+
+def _build_search_query(query, start_date=None, end_date=None, search_field=None):
     if not query or not isinstance(query, str) or query.strip() == "":
         raise ValueError("Query must be a non-empty string.")
-    base_url = "http://export.arxiv.org/api/query"
     field_map = {"title": "ti", "author": "au", "summary": "abs"}
     if search_field and search_field in field_map:
         search_query = f'{field_map[search_field]}:"{query}"'
@@ -22,46 +29,152 @@ def search_arxiv(query, max_results=10, start_date=None, end_date=None, search_f
         else:
             date_query[-1] += " *]"
         search_query = f"{search_query} AND {''.join(date_query)}"
+    return search_query
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+CHUNK_SIZE = 64 * 1024
+
+def _fetch_page(search_query, start, max_results, session=None, cache=None, rate_limiter=None):
     params = {
         "search_query": search_query,
-        "start": 0,
+        "start": start,
         "max_results": max_results
     }
-    try:
-        resp = requests.get(base_url, params=params, timeout=10)
-    except requests.RequestException:
-        raise ConnectionError("Network error occurred.")
+    entry = None
+    headers = {}
+    if cache is not None:
+        key = cache.key(params)
+        entry = cache.get(key)
+        if entry is not None:
+            if cache.is_fresh(entry):
+                cache.record("hits")
+                return iter(entry["results"])
+            # 期限切れはETag/Last-Modifiedで条件付きリクエスト
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+    kwargs = {"headers": headers} if headers else {}
+    client = session or get_default_transport()
+    if not isinstance(client, Transport):
+        kwargs["timeout"] = REQUEST_TIMEOUT
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            resp = client.get(BASE_URL, params=params, stream=True, **kwargs)
+        except requests.RequestException:
+            raise ConnectionError("Network error occurred.")
+        if resp.status_code != 429 or rate_limiter is None or attempt >= rate_limiter.max_retries:
+            break
+        # 429はRetry-After・バックオフ分だけ全ワーカーを止めてから再試行する
+        resp.close()
+        rate_limiter.on_rate_limited(attempt, resp.headers.get("Retry-After"))
+        attempt += 1
+    if entry is not None and resp.status_code == 304:
+        resp.close()
+        cache.touch(key, entry)
+        cache.record("revalidated")
+        return iter(entry["results"])
     if resp.status_code == 429:
         raise Exception("Rate limit exceeded.")
     if resp.status_code != 200:
         raise ValueError(f"arXiv API error: {resp.status_code}")
+    if cache is None:
+        return _iter_response(resp)
+    cache.record("misses")
+    return _iter_cached(resp, cache, key)
+
+def _iter_response(resp):
+    # 途中で読み捨てられた場合も接続を解放する
     try:
-        root = ET.fromstring(resp.text)
+        yield from _iter_entries(resp.iter_content(CHUNK_SIZE))
+    finally:
+        resp.close()
+
+def _iter_cached(resp, cache, key):
+    # 最後まで読み切ったページだけをキャッシュに保存する
+    results = []
+    for paper in _iter_response(resp):
+        results.append(dict(paper) if paper is not None else None)
+        yield paper
+    cache.put(key, results, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
+def _iter_entries(chunks):
+    # Atomフィードを受信しながら逐次パースし、entryが閉じるたびにyieldする
+    # 処理済みentryはツリーから外すので、メモリは1件分で頭打ちになる
+    ns = {'atom': ATOM_NS}
+    entry_tag = f"{{{ATOM_NS}}}entry"
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                elif elem.tag == entry_tag:
+                    yield _parse_entry(elem, ns)
+                    elem.clear()
+                    if root is not None:
+                        root.remove(elem)
+        parser.close()
+    except requests.RequestException:
+        raise ConnectionError("Network error occurred.")
     except Exception:
         raise ValueError("Invalid API response format.")
-    ns = {'atom': 'http://www.w3.org/2005/Atom'}
-    entries = root.findall('atom:entry', ns)
-    results = []
-    for entry in entries:
-        try:
-            title = entry.find('atom:title', ns).text.strip()
-            authors = [a.find('atom:name', ns).text.strip() for a in entry.findall('atom:author', ns)]
-            summary = entry.find('atom:summary', ns).text.strip()
-            arxiv_id = entry.find('atom:id', ns).text
-            pdf_url = None
-            for link in entry.findall('atom:link', ns):
-                if link.attrib.get('type') == 'application/pdf':
-                    pdf_url = link.attrib.get('href')
-                    break
-            if not pdf_url:
-                pdf_url = arxiv_id.replace('abs', 'pdf') + '.pdf'
-            results.append({
-                "id": arxiv_id,
-                "title": title,
-                "authors": authors,
-                "summary": summary,
-                "pdf_url": pdf_url
-            })
-        except Exception:
-            continue
-    return results
+
+def _parse_entry(entry, ns):
+    # 必須要素が欠けたエントリはNone
+    try:
+        title = entry.find('atom:title', ns).text.strip()
+        authors = [a.find('atom:name', ns).text.strip() for a in entry.findall('atom:author', ns)]
+        summary = entry.find('atom:summary', ns).text.strip()
+        arxiv_id = entry.find('atom:id', ns).text
+        pdf_url = None
+        for link in entry.findall('atom:link', ns):
+            if link.attrib.get('type') == 'application/pdf':
+                pdf_url = link.attrib.get('href')
+                break
+        if not pdf_url:
+            pdf_url = arxiv_id.replace('abs', 'pdf') + '.pdf'
+        return {
+            "id": arxiv_id,
+            "title": title,
+            "authors": authors,
+            "summary": summary,
+            "pdf_url": pdf_url
+        }
+    except Exception:
+        return None
+
+def search_arxiv(query, max_results=10, start_date=None, end_date=None, search_field=None, session=None, cache=None, rate_limiter=None):
+    search_query = _build_search_query(query, start_date, end_date, search_field)
+    return [p for p in _fetch_page(search_query, 0, max_results, session, cache, rate_limiter) if p is not None]
+
+def iter_arxiv(query, max_results=None, page_size=100, start_date=None, end_date=None, search_field=None, delay=REQUEST_DELAY, session=None, cache=None, rate_limiter=None):
+    # startをずらしながらページ単位で取得し、論文を1件ずつyieldする
+    # max_results=Noneなら結果が尽きるまで取得する
+    search_query = _build_search_query(query, start_date, end_date, search_field)
+    if not isinstance(page_size, int) or page_size <= 0:
+        raise ValueError("page_size must be a positive integer.")
+    start = 0
+    yielded = 0
+    while max_results is None or yielded < max_results:
+        size = page_size if max_results is None else min(page_size, max_results - yielded)
+        # rate_limiterがあれば間隔制御はそちらに任せる
+        if start > 0 and delay and rate_limiter is None:
+            time.sleep(delay)
+        count = 0
+        for paper in _fetch_page(search_query, start, size, session, cache, rate_limiter):
+            count += 1
+            if paper is not None:
+                yield paper
+                yielded += 1
+        if count < size:
+            break
+        start += count
@@ -0,0 +1,92 @@
+# Atomフィードのパース方式比較（全体読み込み＋fromstring vs XMLPullParserによる逐次パース）
+# 使い方: python benchmarks/bench_arxiv_stream.py [--entries N] [--fixture 録画済みフィードのパス]
+# 各方式を別プロセスで実行し、ピークRSSと最初の1件が得られるまでの時間を比較する
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from arxiv_client import ATOM_NS, CHUNK_SIZE, _iter_entries, _parse_entry
+
+
+def write_fixture(path, entries):
+    summary = "We study retrieval augmented generation for large language models. " * 20
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="{ATOM_NS}"><title>bench</title>\n')
+        for i in range(entries):
+            f.write(
+                f"<entry><id>http://arxiv.org/abs/2403.{i:05d}v1</id><title>Paper {i}</title>"
+                f"<summary>{summary}</summary>"
+                + "".join(f"<author><name>Author {i}-{j}</name></author>" for j in range(5))
+                + f'<link href="http://arxiv.org/pdf/2403.{i:05d}v1" type="application/pdf"/></entry>\n'
+            )
+        f.write("</feed>\n")
+
+
+def read_chunks(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def run_fromstring(path):
+    # 従来方式: 本文全体を文字列にしてからツリーを構築
+    start = time.perf_counter()
+    text = b"".join(read_chunks(path)).decode("utf-8")
+    root = ET.fromstring(text)
+    ns = {"atom": ATOM_NS}
+    first = None
+    count = 0
+    for entry in root.findall("atom:entry", ns):
+        _parse_entry(entry, ns)
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first, time.perf_counter() - start, count
+
+
+def run_stream(path):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in _iter_entries(read_chunks(path)):
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first, time.perf_counter() - start, count
+
+
+def child(mode, path):
+    first, total, count = {"fromstring": run_fromstring, "stream": run_stream}[mode](path)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:<11} entries={count:<7} first={first * 1000:8.1f}ms total={total * 1000:8.1f}ms peak_rss={peak_kb / 1024:7.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--fixture")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+    path = args.fixture
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "feed.xml")
+        write_fixture(path, args.entries)
+    print(f"fixture: {path} ({os.path.getsize(path) / 1024 / 1024:.1f}MB)")
+    for mode in ("fromstring", "stream"):
+        subprocess.run([sys.executable, __file__, "--child", mode, path], check=True)
+
+
+if __name__ == "__main__":
+    main()
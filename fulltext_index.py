@@ -0,0 +1,457 @@
+import re
+import sys
+import json
+import math
+import time
+import heapq
+import base64
+import signal
+import hashlib
+import threading
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from collections import namedtuple
+from highlight import Highlighter, compile_pattern
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10以前
+    import sre_parse
+
+# 正規表現検索1回あたりの照合時間の上限（秒）。論文ごとに確認し、超えたらTimeoutError
+REGEX_TIME_LIMIT = 5.0
+
+# Trueなら (a+)+ のような入れ子の繰り返しを含む正規表現をValueErrorで拒否する
+# （正当なパターンも拒否し得るので既定では無効。時間の上限はregex_time_limitで掛かる）
+REJECT_NESTED_REPEATS = False
+
+# order_by_score（BM25F）のパラメータ。フィールドの重みは (title, authors, summary) の順
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = (3.0, 2.0, 1.0)
+
+
+def normalize_text(s):
+    # fulltext_searchと同じ正規化（NFKC・小文字化・空白除去、文字列以外は空）
+    if not isinstance(s, str):
+        return ""
+    s = unicodedata.normalize('NFKC', s)
+    return s.lower().replace(" ", "")
+
+
+def join_authors(auths):
+    if isinstance(auths, list):
+        # flatten and stringify
+        flat = []
+        for a in auths:
+            if isinstance(a, list):
+                flat.extend([str(x) for x in a])
+            else:
+                flat.append(str(a))
+        return " ".join(flat)
+    return str(auths)
+
+
+# 論文ごとの正規化済みフィールド（authorsは空白連結、authors_csvはカンマ連結）
+PaperShadow = namedtuple("PaperShadow", ["title", "authors", "authors_csv", "summary"])
+
+
+def paper_shadow(p):
+    auths = p.get("authors", [])
+    if isinstance(auths, list):
+        csv = ",".join(a if isinstance(a, str) else str(a) for a in auths)
+    else:
+        csv = str(auths)
+    return PaperShadow(
+        normalize_text(p.get("title", "")),
+        normalize_text(join_authors(auths)),
+        normalize_text(csv),
+        normalize_text(p.get("summary", "")),
+    )
+
+
+def regex_prefilter_unsafe(p):
+    # 正規表現は元のフィールドに掛けるが、候補の絞り込みは正規化済みのテキストで行う
+    # NFKCで形が変わるテキスト（結合文字の合成など）や、小文字化が文脈で変わるΣを含むテキストは
+    # 元のフィールドに含まれるリテラルが正規化後に残らないことがあるので、絞り込まずに常に照合する
+    for s in (p.get("title", ""), join_authors(p.get("authors", [])), p.get("summary", "")):
+        if isinstance(s, str) and ("Σ" in s or not unicodedata.is_normalized("NFKC", s)):
+            return True
+    return False
+
+
+def authors_key(authors):
+    # 著者リストの完全一致判定用のハッシュ可能な指紋（リスト・dictは再帰的にタプル化）
+    if isinstance(authors, list):
+        return tuple(authors_key(a) for a in authors)
+    if isinstance(authors, dict):
+        return tuple(sorted((str(k), authors_key(v)) for k, v in authors.items()))
+    return authors
+
+
+def shadow_size(sh):
+    # 影表現1件あたりのメモリ消費（タプル本体＋各文字列）
+    return sys.getsizeof(sh) + sum(sys.getsizeof(f) for f in sh)
+
+
+def query_keywords(keyword):
+    # fulltext_searchの検索語（単語またはリスト）を (正規化済みの語, 元の語) に分ける
+    if isinstance(keyword, list):
+        return [normalize_text(k) for k in keyword], keyword
+    return [normalize_text(keyword)], [keyword]
+
+
+# 検索条件ごとに1回だけ用意するもの
+# patternsはコンパイル済みの正規表現（regex=Trueのみ）、termsはインデックスで候補を絞るための正規化済みの語
+# （正規表現では必ず含まれるリテラル部分、無ければ空文字列）
+CompiledQuery = namedtuple("CompiledQuery", ["keywords", "raw_keywords", "patterns", "terms"])
+
+
+def compile_query(keyword, regex=False):
+    # query_keywordsの結果と正規表現のコンパイル・リテラル抽出を検索条件ごとにキャッシュする
+    key = tuple(keyword) if isinstance(keyword, list) else keyword
+    try:
+        return _compile_query(key, isinstance(keyword, list), regex, REJECT_NESTED_REPEATS)
+    except TypeError:  # ハッシュできない検索語はキャッシュしない
+        return _build_query(keyword, regex)
+
+
+@lru_cache(maxsize=256)
+def _compile_query(key, is_list, regex, reject_nested):
+    # reject_nestedはREJECT_NESTED_REPEATSの変更をキャッシュのキーに反映するためだけの引数
+    return _build_query(list(key) if is_list else key, regex)
+
+
+def _build_query(keyword, regex):
+    keywords, raw_keywords = query_keywords(keyword)
+    if not regex:
+        return CompiledQuery(keywords, raw_keywords, None, keywords)
+    patterns = []
+    terms = []
+    for raw_kw in raw_keywords:
+        try:
+            parsed = sre_parse.parse(raw_kw, re.IGNORECASE)
+            pattern = compile_pattern(raw_kw)
+        except (re.error, TypeError):
+            # 不正なパターンは照合時に従来どおりの例外になるよう、コンパイル済みのものを持たない
+            patterns = None
+            terms.append("")
+            continue
+        if REJECT_NESTED_REPEATS and _nested_repeat(parsed):
+            raise ValueError("Regex has nested repeats that may backtrack catastrophically: %r" % raw_kw)
+        if patterns is not None:
+            patterns.append(pattern)
+        terms.append(normalize_text(_required_literal(parsed)))
+    return CompiledQuery(keywords, raw_keywords, patterns, terms)
+
+
+def _required_literal(parsed):
+    # 一致すれば必ず含まれる、先頭レベルの連続したリテラルのうち最長のもの
+    best = run = ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        if op is sre_parse.MAX_REPEAT or op is sre_parse.MIN_REPEAT:
+            lo, _, item = av
+            if lo >= 1 and len(item) == 1 and item[0][0] is sre_parse.LITERAL:
+                run += chr(item[0][1])
+        best = max(best, run, key=len)
+        run = ""
+    return max(best, run, key=len)
+
+
+def _nested_repeat(parsed, in_repeat=False):
+    # 可変回数の繰り返しの中にさらに可変回数の繰り返しがある（(a+)+ など、入力によって指数時間になり得る）
+    for op, av in parsed:
+        if op is sre_parse.MAX_REPEAT or op is sre_parse.MIN_REPEAT:
+            lo, hi, item = av
+            variable = hi != lo
+            if variable and in_repeat:
+                return True
+            if _nested_repeat(item, in_repeat or variable):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _nested_repeat(av[-1], in_repeat):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_nested_repeat(branch, in_repeat) for branch in av[1]):
+                return True
+        elif op is sre_parse.ASSERT or op is sre_parse.ASSERT_NOT:
+            if _nested_repeat(av[1], in_repeat):
+                return True
+    return False
+
+
+def match_paper(p, sh, keywords, raw_keywords, exact=False, regex=False, mode="OR", patterns=None):
+    # patternsはcompile_queryのコンパイル済み正規表現（無ければ語ごとにコンパイルする）
+    targets = [sh.title, sh.authors, sh.summary]
+    if regex:
+        raw_targets = [
+            p.get("title", ""),
+            join_authors(p.get("authors", [])),
+            p.get("summary", "")
+        ]
+    for i, kw in enumerate(keywords):
+        raw_kw = raw_keywords[i] if i < len(raw_keywords) else kw
+        if regex:
+            pattern = patterns[i] if patterns else compile_pattern(raw_kw)
+            found = any(pattern.search(t) for t in raw_targets)
+        elif exact:
+            found = any(kw == t for t in targets)
+        else:
+            found = any(kw in t for t in targets)
+        if mode == "AND" and not found:
+            return False
+        if mode == "OR" and found:
+            return True
+    return mode == "AND"
+
+
+def bm25_scorer(keywords, doc_count, avg_lengths, doc_freqs, exact=False, patterns=None):
+    # order_by_score用のスコア関数 (論文, 正規化済みフィールド) -> float（大きいほど上位）
+    # 語の出現数をフィールドごとに重みと長さ（平均長avg_lengthsとの比）で正規化して合算し（BM25F）、
+    # 文書頻度doc_freqs（語ごと、全doc_count件中）から求めたidfを掛ける
+    # patterns（正規表現）があれば出現数は元のフィールドでの一致数で数える
+    terms = []
+    for i, kw in enumerate(keywords):
+        if not kw:
+            continue
+        df = min(doc_freqs[i], doc_count)
+        terms.append((i, kw, math.log(1 + (doc_count - df + 0.5) / (df + 0.5))))
+    avg_lengths = list(avg_lengths) + [0] * (len(FIELD_WEIGHTS) - len(avg_lengths))
+    (wt, wa, ws), base = FIELD_WEIGHTS, 1 - BM25_B
+    st, sa, ss = (BM25_B / (avg or 1) for avg in avg_lengths[:3])
+    k1 = BM25_K1
+
+    def score(match):
+        p, sh = match
+        title, authors, summary = sh.title, sh.authors, sh.summary
+        # 1回の出現がtfに足す量（フィールドの重み÷長さの補正）
+        ft = wt / (base + st * len(title))
+        fa = wa / (base + sa * len(authors))
+        fs = ws / (base + ss * len(summary))
+        if patterns:
+            raws = [t if isinstance(t, str) else "" for t in (p.get("title", ""), p.get("summary", ""))]
+            raws.insert(1, join_authors(p.get("authors", [])))
+        total = 0.0
+        for i, kw, idf in terms:
+            if patterns:
+                ct, ca, cs = (sum(1 for m in patterns[i].finditer(raw) if m.end() > m.start()) for raw in raws)
+                tf = ct * ft + ca * fa + cs * fs
+            elif exact:
+                tf = (kw == title) * ft + (kw == authors) * fa + (kw == summary) * fs
+            else:
+                tf = title.count(kw) * ft + authors.count(kw) * fa + summary.count(kw) * fs
+            if tf:
+                total += idf * tf * (k1 + 1) / (tf + k1)
+        return total
+    return score
+
+
+@contextmanager
+def regex_time_limit(regex):
+    # 正規表現検索全体にREGEX_TIME_LIMIT秒の上限を掛ける。メインスレッドではSIGALRMで1回の照合の途中でも
+    # TimeoutErrorにする（別スレッド・SIGALRMの無いOS・他がSIGALRMを使っている場合は、iter_matchesでの
+    # 論文ごとの確認だけになる）
+    if not regex:
+        yield
+        return
+    if REGEX_TIME_LIMIT <= 0:
+        raise TimeoutError("Regex search exceeded %.1f seconds." % REGEX_TIME_LIMIT)
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread() or \
+            signal.getsignal(signal.SIGALRM) is not signal.SIG_DFL or signal.getitimer(signal.ITIMER_REAL)[0]:
+        yield
+        return
+
+    def expired(signum, frame):
+        raise TimeoutError("Regex search exceeded %.1f seconds." % REGEX_TIME_LIMIT)
+    signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, REGEX_TIME_LIMIT)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+
+
+def iter_matches(papers, shadow_of, keywords, raw_keywords, exact=False, regex=False, mode="OR", patterns=None):
+    # 一致した論文を (論文, 正規化済みフィールド) で順に返す（コピーはしない）
+    # 正規表現ではREGEX_TIME_LIMITを過ぎた時点でTimeoutError（論文ごとの確認。照合中の打ち切りはregex_time_limit）
+    deadline = time.monotonic() + REGEX_TIME_LIMIT if regex else None
+    for p in papers:
+        sh = shadow_of(p)
+        if match_paper(p, sh, keywords, raw_keywords, exact, regex, mode, patterns):
+            yield p, sh
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("Regex search exceeded %.1f seconds." % REGEX_TIME_LIMIT)
+
+
+def rank_by_score(matches, score, k=None):
+    # スコアの高い順（同点は元の順）。kがあれば上位k件だけをヒープで選ぶ
+    if k is None:
+        return sorted(matches, key=score, reverse=True)
+    return heapq.nlargest(k, matches, key=score)
+
+
+def decorate_results(results, keywords, raw_keywords, regex=False, highlight=False, snippets=None,
+                     snippet_width=160):
+    # 返すページの論文（コピー済み）にだけハイライト・抜粋を付ける
+    # snippets=Nではtitle・summaryを全文の代わりに一致の多い最大N個の抜粋（幅snippet_width）にする
+    if snippets and results:
+        highlighter = query_highlighter(raw_keywords if keywords else [], regex)
+        for p in results:
+            for k in ["title", "summary"]:
+                if isinstance(p.get(k), str):
+                    p[k] = highlighter.snippet(p[k], snippet_width, snippets)
+            if p.get("authors") is not None:
+                p["authors"] = highlighter.highlight_field(p["authors"])
+    # ハイライト（title, summary, authorsリスト含む全対応）
+    elif highlight and results and keywords:
+        highlighter = query_highlighter(raw_keywords, regex)
+        for p in results:
+            for k in ["title", "summary", "authors"]:
+                if k in p and p[k] is not None:
+                    p[k] = highlighter.highlight_field(p[k])
+    return results
+
+
+def query_highlighter(raw_keywords, regex=False):
+    # 同じ検索語のHighlighter（キーワードの正規化・コンパイル・Aho–Corasickの構築）を使い回す
+    try:
+        return _cached_highlighter(tuple(raw_keywords), regex)
+    except TypeError:
+        return Highlighter(raw_keywords, regex)
+
+
+@lru_cache(maxsize=64)
+def _cached_highlighter(raw_keywords, regex):
+    return Highlighter(raw_keywords, regex)
+
+
+def search_papers(papers, shadow_of, keywords, raw_keywords, exact=False, regex=False, mode="OR",
+                  order_by_score=False, highlight=False, limit=None, offset=0, return_count=False,
+                  snippets=None, snippet_width=160, patterns=None, score=None):
+    # fulltext_searchの候補絞り込み以降（照合・並べ替え・ページング・ハイライト）
+    # 各ストレージは候補の論文と、その正規化済みフィールドを返すshadow_ofを渡す
+    # 並べ替えが無ければoffset+limit件見つかった時点で走査をやめ、ハイライトは返すページにだけ行う
+    # order_by_scoreではscore（bm25_scorer）の上位offset+limit件だけを選ぶ
+    # ページネーション: 型・値チェック
+    _offset = offset if isinstance(offset, int) and offset >= 0 else 0
+    _limit = limit if (isinstance(limit, int) and limit >= 0) else None
+    stop = None if _limit is None else _offset + _limit
+    with regex_time_limit(regex):
+        matches = iter_matches(papers, shadow_of, keywords, raw_keywords, exact, regex, mode, patterns)
+        if order_by_score:
+            page = rank_by_score(matches, score, stop)[_offset:]
+        else:
+            page = list(islice(matches, _offset, stop))
+        results = decorate_results(
+            [dict(p) for p, _ in page], keywords, raw_keywords, regex, highlight, snippets, snippet_width,
+        )
+    if return_count:
+        return results, len(results)
+    return results
+
+
+def query_fingerprint(*params):
+    # カーソルを発行した検索条件の指紋（別の条件でのカーソル再利用を検出する）
+    return hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(fingerprint, position, last_id=None):
+    raw = json.dumps({"q": fingerprint, "p": position, "id": last_id}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, fingerprint):
+    # (再開位置, 直前に返した論文のID)。壊れたカーソルや別の検索条件のカーソルはValueError
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        position = state["p"]
+        last_id = state["id"]
+        valid = state["q"] == fingerprint and isinstance(position, int) and position >= 0
+    except (AttributeError, KeyError, TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid cursor.")
+    return position, last_id
+
+
+class NgramIndex:
+    # 正規化済みフィールドのn-gram転置インデックス
+    # 部分一致の候補絞り込みに使い、最終判定は呼び出し側で行う
+    # 文書ごとのn-gram集合は持たないので、removeにはaddと同じfieldsを渡す
+    # BM25用に文書数とフィールドごとの長さの合計も持つ
+    # メモリ上のみで永続化せず、Storageを開くたびに全件から作り直す。Storageは論文自体も全件メモリに
+    # 載せるので、対象は数万件規模まで（2万件で開くのに約6秒・約270MB）。それ以上はSQLiteStorageを使う
+    def __init__(self, n=2):
+        self.n = n
+        self._postings = {}
+        self.doc_count = 0
+        self._length_sums = []
+
+    def _doc_grams(self, fields):
+        n = self.n
+        grams = set()
+        for f in fields:
+            grams.update({f[i:i + n] for i in range(len(f) - n + 1)})
+        return grams
+
+    def add(self, doc_id, fields):
+        self._count_lengths(fields, 1)
+        postings = self._postings
+        for g in self._doc_grams(fields):
+            posting = postings.get(g)
+            if posting is None:
+                postings[g] = {doc_id}
+            else:
+                posting.add(doc_id)
+
+    def remove(self, doc_id, fields):
+        self._count_lengths(fields, -1)
+        for g in self._doc_grams(fields):
+            posting = self._postings.get(g)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[g]
+
+    def clear(self):
+        self._postings = {}
+        self.doc_count = 0
+        self._length_sums = []
+
+    def _count_lengths(self, fields, sign):
+        self.doc_count += sign
+        sums = self._length_sums
+        for i, f in enumerate(fields):
+            if i == len(sums):
+                sums.append(0)
+            sums[i] += sign * len(f)
+
+    def average_lengths(self):
+        # フィールドごとの平均長（文書が無ければ0）
+        return [total / self.doc_count if self.doc_count else 0 for total in self._length_sums]
+
+    def candidates(self, term):
+        # 正規化済みの語を含み得る文書IDの集合。n文字未満の語は絞り込めないのでNone
+        n = self.n
+        if len(term) < n:
+            return None
+        grams = {term[i:i + n] for i in range(len(term) - n + 1)}
+        postings = []
+        for g in grams:
+            posting = self._postings.get(g)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
@@ -0,0 +1,287 @@
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from functools import lru_cache
+
+# キーワードがこの数以上ならAho–Corasickで1回の走査にまとめる（数百語まではキーワードごとのstr.findの方が速い）
+AHO_CORASICK_MIN_KEYWORDS = 200
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern):
+    # 検索・ハイライトで使う正規表現（大文字小文字を区別しない）。同じパターンはコンパイル済みのものを使い回す
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@lru_cache(maxsize=65536)
+def _norm_char(c):
+    return unicodedata.normalize('NFKC', c).lower().replace(' ', '')
+
+
+@lru_cache(maxsize=4096)
+def normalized_offsets(text):
+    # 1文字ずつ正規化（NFKC・小文字化・空白除去）した文字列と、元の位置への対応を返す
+    # 対応は「正規化後の各文字の元位置」か「正規化で消えた文字の元位置とそれより前に残った文字数」のどちらかで、
+    # 1文字→複数文字に展開される文字が無ければ前者は作らない（Noneのまま）
+    # 同じフィールドは何度もハイライトされるので結果をキャッシュして使い回す
+    if text.isascii():
+        removed = array("i")
+        i = text.find(" ")
+        while i != -1:
+            removed.append(i)
+            i = text.find(" ", i + 1)
+        return text.lower().replace(" ", ""), None, removed, _shifts(removed)
+    parts = []
+    offsets = array("i")
+    removed = array("i")
+    expanded = False
+    for i, c in enumerate(text):
+        nc = _norm_char(c)
+        if len(nc) != 1:
+            if nc:
+                expanded = True
+            else:
+                removed.append(i)
+        parts.append(nc)
+        offsets.extend([i] * len(nc))
+    if expanded:
+        return "".join(parts), offsets, None, None
+    return "".join(parts), None, removed, _shifts(removed)
+
+
+def _shifts(removed):
+    # k番目に消えた文字より前に残った文字数（正規化後の位置jの元位置は j + bisect_right(shifts, j)）
+    return array("i", [r - k for k, r in enumerate(removed)])
+
+
+def _render(text, spans, a, b):
+    # text[a:b]を、併合済みの一致区間spansを<mark>で囲みながらスライスで組み立てる
+    out = []
+    pos = a
+    for s, e in spans[bisect_right([e for _, e in spans], a):]:
+        if s >= b:
+            break
+        s, e = max(s, a), min(e, b)
+        out.append(text[pos:s])
+        out.append("<mark>")
+        out.append(text[s:e])
+        out.append("</mark>")
+        pos = e
+    out.append(text[pos:b])
+    return "".join(out)
+
+
+class AhoCorasick:
+    # 複数キーワードの同時照合。テキストを1回走査するだけで全キーワードの出現位置が得られる
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for idx, pat in enumerate(self.patterns):
+            state = 0
+            for ch in pat:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(idx)
+        # 失敗遷移は幅優先で浅い状態から決める
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fail = self._goto[f].get(ch, 0) if state else 0
+                self._fail[nxt] = fail
+                self._out[nxt] = self._out[nxt] + self._out[fail]
+
+    def finditer(self, text):
+        # (開始位置, 終了位置, パターン番号) を終了位置の順に返す
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in out[state]:
+                yield i + 1 - len(patterns[idx]), i + 1, idx
+
+
+class Highlighter:
+    # fulltext_search(highlight=True)用。キーワードの正規化・正規表現のコンパイル・照合器の構築は
+    # 検索ごとに1回だけ行い、各フィールドは一致区間を併合してからスライスで組み立てる
+    def __init__(self, keywords, regex=False):
+        norm = []
+        for kw in keywords:
+            nk = unicodedata.normalize('NFKC', str(kw)).lower().replace(' ', '')
+            if nk:
+                norm.append(nk)
+        self.regex = regex
+        self._patterns = []
+        self._keywords = []
+        self._automaton = None
+        if regex:
+            for nk in norm:
+                try:
+                    self._patterns.append(compile_pattern(nk))
+                except re.error:
+                    continue
+        else:
+            self._keywords = list(dict.fromkeys(norm))
+            if len(self._keywords) >= AHO_CORASICK_MIN_KEYWORDS:
+                self._automaton = AhoCorasick(self._keywords)
+
+    def _matches(self, norm):
+        # 正規化後の文字列上の一致区間 (開始, 終了)。キーワードごとに重ならない出現を左から取る
+        if self.regex:
+            for pattern in self._patterns:
+                for m in pattern.finditer(norm):
+                    yield m.start(), m.end()
+        elif self._automaton is not None:
+            next_free = [0] * len(self._keywords)
+            for start, end, idx in self._automaton.finditer(norm):
+                if start >= next_free[idx]:
+                    next_free[idx] = end
+                    yield start, end
+        else:
+            for kw in self._keywords:
+                idx = norm.find(kw)
+                while idx != -1:
+                    yield idx, idx + len(kw)
+                    idx = norm.find(kw, idx + len(kw))
+
+    def intervals(self, text):
+        # 元テキスト上の一致区間を併合して返す。正規化で消えた文字（空白など）は区間に含めない
+        norm, offsets, removed, shifts = normalized_offsets(text)
+        spans = []
+        if offsets is not None:
+            for s, e in self._matches(norm):
+                if s >= e:
+                    continue
+                start = prev = offsets[s]
+                for j in range(s + 1, e):
+                    cur = offsets[j]
+                    if cur > prev + 1:
+                        spans.append((start, prev + 1))
+                        start = cur
+                    prev = cur
+                spans.append((start, prev + 1))
+        else:
+            for s, e in self._matches(norm):
+                if s >= e:
+                    continue
+                lo = bisect_right(shifts, s)
+                hi = bisect_right(shifts, e - 1)
+                start = s + lo
+                for k in range(lo, hi):
+                    if removed[k] > start:
+                        spans.append((start, removed[k]))
+                    start = removed[k] + 1
+                spans.append((start, e + hi))
+        if not spans:
+            return []
+        spans.sort()
+        merged = [list(spans[0])]
+        for s, e in spans[1:]:
+            last = merged[-1]
+            if s <= last[1]:
+                if e > last[1]:
+                    last[1] = e
+            else:
+                merged.append([s, e])
+        return [tuple(span) for span in merged]
+
+    def highlight(self, text):
+        if not isinstance(text, str) or not text or not (self._patterns or self._keywords):
+            return text
+        spans = self.intervals(text)
+        if not spans:
+            return text
+        return _render(text, spans, 0, len(text))
+
+    def windows(self, text, width=160, count=2, spans=None):
+        # 一致した文字の割合が高い順に最大count個の窓（幅widthを基準）を選び、位置順に返す
+        # 窓は一致区間の途中で切らないよう広げ、重なった窓は1つにまとめる。一致が無ければ先頭の窓
+        n = len(text)
+        if spans is None:
+            spans = self.intervals(text)
+        if n <= width:
+            return [(0, n)]
+        if not spans:
+            return [(0, width)]
+        starts = [s for s, _ in spans]
+        ends = [e for _, e in spans]
+        prefix = [0]
+        for s, e in spans:
+            prefix.append(prefix[-1] + e - s)
+
+        def marked(a, b):
+            i = bisect_right(ends, a)
+            j = bisect_left(starts, b)
+            if i >= j:
+                return 0
+            total = prefix[j] - prefix[i]
+            if starts[i] < a:
+                total -= a - starts[i]
+            if ends[j - 1] > b:
+                total -= ends[j - 1] - b
+            return total
+
+        # 候補は各一致を中央に置く窓と、各一致の少し手前から始まる窓
+        candidates = []
+        for s, e in spans:
+            for a in (s - (width - (e - s)) // 2, s - width // 10):
+                a = max(0, min(a, n - width))
+                candidates.append((-marked(a, a + width), a, a + width))
+        candidates.sort()
+        chosen = []
+        for _, a, b in candidates:
+            if any(a < cb and ca < b for ca, cb in chosen):
+                continue
+            chosen.append((a, b))
+            if len(chosen) >= count:
+                break
+        result = []
+        for a, b in sorted(chosen):
+            i = bisect_right(ends, a)
+            if i < len(spans) and starts[i] < a:
+                a = starts[i]
+            j = bisect_left(starts, b)
+            if j and ends[j - 1] > b:
+                b = ends[j - 1]
+            if result and a <= result[-1][1]:
+                result[-1] = (result[-1][0], max(b, result[-1][1]))
+            else:
+                result.append((a, b))
+        return result
+
+    def snippet(self, text, width=160, count=2, ellipsis="…"):
+        # KWIC表示用の抜粋。選んだ窓だけをハイライトし、省略した部分をellipsisでつなぐ
+        if not isinstance(text, str) or not text:
+            return text
+        spans = self.intervals(text) if (self._patterns or self._keywords) else []
+        out = []
+        last = 0
+        for a, b in self.windows(text, width, count, spans):
+            if a > last:
+                out.append(ellipsis)
+            out.append(_render(text, spans, a, b))
+            last = b
+        if last < len(text):
+            out.append(ellipsis)
+        return "".join(out)
+
+    def highlight_field(self, val):
+        if isinstance(val, list):
+            return [self.highlight_field(v) for v in val]
+        return self.highlight(val)
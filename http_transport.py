@@ -0,0 +1,83 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+def _counting_pool(base, transport):
+    # 新規接続の生成とプールからの取り出しを数えるコネクションプール
+    class CountingPool(base):
+        def _new_conn(self):
+            transport._count("opened")
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            transport._count("checkouts")
+            return super()._get_conn(timeout)
+
+    return CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, transport, **kwargs):
+        self._transport = transport
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._transport),
+            "https": _counting_pool(HTTPSConnectionPool, self._transport),
+        }
+
+
+class Transport:
+    # arxiv_clientとpdf_downloaderで共有するkeep-alive付きHTTPセッション
+    # retries=0（既定）ではHTTPステータスの扱いを呼び出し側に任せる
+    def __init__(self, pool_size=10, timeout=10, retries=0, backoff_factor=0.5,
+                 status_forcelist=(500, 502, 503, 504)):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._counts = {"opened": 0, "checkouts": 0}
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _CountingAdapter(self, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            opened = self._counts["opened"]
+            checkouts = self._counts["checkouts"]
+        return {"opened": opened, "reused": max(0, checkouts - opened), "requests": checkouts}
+
+    def close(self):
+        self.session.close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport():
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+        return _default_transport
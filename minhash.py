@@ -0,0 +1,104 @@
+import zlib
+import random
+
+_MASK = (1 << 64) - 1
+_BAND_MUL = 0x100000001B3
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def stable_hash(s):
+    # 組み込みのhash()と違いプロセスをまたいで同じ値になる（永続化する署名用）
+    # CRC32を64bitに広げて使う。シングル単位の呼び出しが多いので暗号学的ハッシュは使わない
+    return (zlib.crc32(s.encode("utf-8")) * _GOLDEN) & _MASK
+
+
+class MinHashLSH:
+    # 文字n-gramのMinHash署名とLSHバンディングによる類似候補の索引
+    # 候補は近似なので、最終判定は呼び出し側で行う
+    # hash_funcは既定で組み込みのhash()。バンドキーを保存して再利用する場合はstable_hashを渡す
+    def __init__(self, num_perm=96, bands=32, shingle=3, seed=1, hash_func=hash):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.hash_func = hash_func
+        rng = random.Random(seed)
+        # 空ビン補完時のオフセット用
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        self._buckets = [{} for _ in range(bands)]
+        self._keys = {}
+
+    def signature(self, text):
+        # One Permutation Hashing: 1回のハッシュで各シングルをnum_perm個のビンに振り分け、
+        # ビンごとの最小値を署名とする（空ビンは右隣の値で埋める）
+        k = self.shingle
+        n = self.num_perm
+        h = self.hash_func
+        hashes = {h(text[i:i + k]) & _MASK for i in range(len(text) - k + 1)}
+        if not hashes:
+            hashes = {h(text) & _MASK}
+        sig = [None] * n
+        for h in hashes:
+            b = h % n
+            v = h // n
+            cur = sig[b]
+            if cur is None or v < cur:
+                sig[b] = v
+        if None in sig:
+            filled = [i for i in range(n) if sig[i] is not None]
+            for i in range(n):
+                if sig[i] is None:
+                    j = next((f for f in filled if f > i), filled[0])
+                    sig[i] = sig[j] + ((j - i) % n) * self._masks[i]
+        return sig
+
+    def _band_keys(self, sig):
+        # バンドごとの署名を符号付き64bitの整数に畳み込む（tupleのhashと違いPythonの版に依存しない）
+        r = self.rows
+        keys = []
+        for b in range(self.bands):
+            k = b
+            for v in sig[b * r:(b + 1) * r]:
+                k = ((k ^ v) * _BAND_MUL) & _MASK
+            keys.append(k - (1 << 64) if k >> 63 else k)
+        return keys
+
+    def band_keys(self, text):
+        # textのバンドキー（バンド番号順）。空文字列は索引しないので空リスト
+        if not text:
+            return []
+        return self._band_keys(self.signature(text))
+
+    def add(self, key, text):
+        if key in self._keys:
+            self.remove(key)
+        band_keys = self.band_keys(text)
+        if not band_keys:
+            return
+        self._keys[key] = band_keys
+        for bucket, bk in zip(self._buckets, band_keys):
+            bucket.setdefault(bk, set()).add(key)
+
+    def remove(self, key):
+        band_keys = self._keys.pop(key, None)
+        if band_keys is None:
+            return
+        for bucket, bk in zip(self._buckets, band_keys):
+            members = bucket.get(bk)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del bucket[bk]
+
+    def query(self, text):
+        result = set()
+        for bucket, bk in zip(self._buckets, self.band_keys(text)):
+            members = bucket.get(bk)
+            if members:
+                result |= members
+        return result
+
+    def __len__(self):
+        return len(self._keys)
@@ -1,21 +1,27 @@
 import os
 import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 import requests
+from http_transport import Transport, get_default_transport
 
-def download_pdf(url, save_path, timeout=20, max_size_mb=10):
-    if not url or not isinstance(url, str) or url.strip() == "":
-        raise ValueError("URL must be a non-empty string.")
-    if os.path.isdir(save_path):
-        raise Exception("Save path is a directory.")
-    if re.search(r'[\\/:*?"<>|]', os.path.basename(save_path)):
-        raise Exception("Invalid characters in filename.")
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    try:
-        resp = requests.get(url, stream=True, timeout=timeout)
-    except Exception as e:
-        raise Exception("Network error or timeout.") from e
+# リトライ対象のHTTPステータス
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class NetworkError(Exception):
+    pass
+
+class HTTPStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP error: {status_code}")
+        self.status_code = status_code
+
+def _write_body(resp, save_path, max_size_mb):
     if resp.status_code != 200:
-        raise Exception(f"HTTP error: {resp.status_code}")
+        raise HTTPStatusError(resp.status_code)
     content_type = resp.headers.get("Content-Type", "")
     if not content_type.startswith("application/pdf"):
         raise Exception("Content is not PDF.")
@@ -32,9 +38,166 @@ def download_pdf(url, save_path, timeout=20, max_size_mb=10):
     if total_size == 0:
         os.remove(save_path)
         raise Exception("Downloaded file size is zero.")
+
+def _write_part(resp, part_path, offset, max_size_mb):
+    if resp.status_code == 206 and offset:
+        content_range = resp.headers.get("Content-Range", "")
+        if not content_range.startswith(f"bytes {offset}-"):
+            raise Exception("Unexpected Content-Range.")
+        mode = "ab"
+    elif resp.status_code == 200:
+        # Range非対応のサーバや、If-Rangeが一致せずリモートが変わっていた場合は最初から送ってくる
+        offset = 0
+        mode = "wb"
+    else:
+        raise HTTPStatusError(resp.status_code)
+    content_type = resp.headers.get("Content-Type", "")
+    if not content_type.startswith("application/pdf"):
+        raise Exception("Content is not PDF.")
+    if mode == "wb":
+        _save_validator(part_path, resp)
+    total_size = offset
+    with open(part_path, mode) as f:
+        try:
+            for chunk in resp.iter_content(1024 * 1024):
+                if chunk:
+                    total_size += len(chunk)
+                    if total_size > max_size_mb * 1024 * 1024:
+                        f.close()
+                        _discard_part(part_path)
+                        raise Exception("File too large.")
+                    f.write(chunk)
+        except requests.RequestException as e:
+            # 受信済みの分は.partに残し、次回はその続きから再開する
+            raise NetworkError("Network error or timeout.") from e
+
+def _save_validator(part_path, resp):
+    # .partと同じ版かを再開時に確かめるため、ETag/Last-Modifiedを.part.metaに残す
+    validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+    if validator:
+        with open(part_path + ".meta", "w", encoding="utf-8") as f:
+            json.dump({"validator": validator}, f)
+    elif os.path.exists(part_path + ".meta"):
+        os.remove(part_path + ".meta")
+
+def _load_validator(part_path):
+    try:
+        with open(part_path + ".meta", encoding="utf-8") as f:
+            return json.load(f).get("validator")
+    except (OSError, ValueError):
+        return None
+
+def _discard_part(part_path):
+    for path in (part_path, part_path + ".meta"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _download_resumable(get, url, save_path, timeout, max_size_mb):
+    # .partに書き込み、既存の.partがあればRange+If-Rangeで続きから取得する
+    # 版を確かめる手段（ETag/Last-Modified）が残っていない.partは継ぎ足さず最初から取り直す
+    part_path = save_path + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = _load_validator(part_path) if offset else None
+    if validator:
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+    else:
+        offset = 0
+        headers = {}
+    try:
+        resp = get(url, stream=True, timeout=timeout, headers=headers)
+    except Exception as e:
+        raise NetworkError("Network error or timeout.") from e
+    try:
+        # 416は.partが既に全体を含んでいる場合
+        if not (offset and resp.status_code == 416):
+            _write_part(resp, part_path, offset, max_size_mb)
+    finally:
+        resp.close()
+    if not os.path.exists(part_path) or os.path.getsize(part_path) == 0:
+        _discard_part(part_path)
+        raise Exception("Downloaded file size is zero.")
+    with open(part_path, "rb") as f:
+        head = f.read(4)
+    if head != b'%PDF':
+        _discard_part(part_path)
+        raise Exception("File content is not PDF.")
+    os.replace(part_path, save_path)
+    if os.path.exists(part_path + ".meta"):
+        os.remove(part_path + ".meta")
+
+def download_pdf(url, save_path, timeout=20, max_size_mb=10, session=None, resume=False):
+    if not url or not isinstance(url, str) or url.strip() == "":
+        raise ValueError("URL must be a non-empty string.")
+    if os.path.isdir(save_path):
+        raise Exception("Save path is a directory.")
+    if re.search(r'[\\/:*?"<>|]', os.path.basename(save_path)):
+        raise Exception("Invalid characters in filename.")
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    get = (session or get_default_transport()).get
+    if resume:
+        _download_resumable(get, url, save_path, timeout, max_size_mb)
+        return True
+    try:
+        resp = get(url, stream=True, timeout=timeout)
+    except Exception as e:
+        raise NetworkError("Network error or timeout.") from e
+    try:
+        _write_body(resp, save_path, max_size_mb)
+    finally:
+        # セッション共有時にコネクションをプールへ返す
+        resp.close()
     with open(save_path, "rb") as f:
         head = f.read(4)
         if head[:4] != b'%PDF':
             os.remove(save_path)
             raise Exception("File content is not PDF.")
     return True
+
+def _is_retryable(e):
+    if isinstance(e, HTTPStatusError):
+        return e.status_code in RETRY_STATUSES
+    return isinstance(e, (NetworkError, requests.RequestException))
+
+def download_many(jobs, concurrency=8, per_host=4, retries=3, backoff=1.0, timeout=20, max_size_mb=10, session=None, resume=False):
+    # jobsは(url, save_path)のタプルか{"url", "save_path"}のdict
+    # 429/5xx・通信エラーは指数バックオフで再試行し、ジョブ順の結果一覧を返す
+    jobs = [(j["url"], j["save_path"]) if isinstance(j, dict) else tuple(j) for j in jobs]
+    own_session = session is None
+    if own_session:
+        session = Transport(pool_size=concurrency, timeout=timeout)
+    host_limits = {}
+    lock = threading.Lock()
+
+    def host_limit(url):
+        host = urlparse(url).netloc if isinstance(url, str) else ""
+        with lock:
+            if host not in host_limits:
+                host_limits[host] = threading.BoundedSemaphore(per_host)
+            return host_limits[host]
+
+    def run(job):
+        url, save_path = job
+        result = {"url": url, "save_path": save_path, "ok": False, "attempts": 0, "error": None}
+        for attempt in range(retries + 1):
+            result["attempts"] = attempt + 1
+            try:
+                with host_limit(url):
+                    download_pdf(url, save_path, timeout=timeout, max_size_mb=max_size_mb, session=session, resume=resume)
+                result["ok"] = True
+                result["error"] = None
+                break
+            except Exception as e:
+                result["error"] = str(e)
+                if attempt == retries or not _is_retryable(e):
+                    break
+                time.sleep(backoff * (2 ** attempt))
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            results = list(pool.map(run, jobs))
+    finally:
+        if own_session:
+            session.close()
+    succeeded = sum(1 for r in results if r["ok"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
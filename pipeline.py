@@ -0,0 +1,94 @@
+import os
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from arxiv_client import iter_arxiv
+from pdf_downloader import download_pdf
+
+# キュー終端の目印
+_DONE = object()
+
+
+def pdf_filename(paper_id):
+    # "http://arxiv.org/abs/2401.00001v1" → "2401.00001v1.pdf"
+    name = paper_id.split("/abs/")[-1]
+    return re.sub(r'[\\/:*?"<>|]', "_", name) + ".pdf"
+
+
+async def harvest(query, storage, pdf_dir, max_results=None, page_size=100, download_workers=4, queue_size=100,
+                  skip_duplicates=True, session=None, **search_kwargs):
+    # 検索（ページング）→PDF取得→保存を非同期に重ねて実行する
+    # 各段の間は上限付きキューでつなぎ、下流が詰まれば上流も待つ（バックプレッシャ）
+    # 既存のiter_arxiv/download_pdf/Storageをスレッドで動かし、Storageの操作は1スレッドに直列化する
+    loop = asyncio.get_running_loop()
+    net_executor = ThreadPoolExecutor(max_workers=download_workers + 1)
+    store_executor = ThreadPoolExecutor(max_workers=1)
+    download_q = asyncio.Queue(maxsize=queue_size)
+    store_q = asyncio.Queue(maxsize=queue_size)
+    report = {"found": 0, "skipped": 0, "downloaded": 0, "failed": 0, "stored": 0, "errors": []}
+
+    async def search_stage():
+        papers = iter_arxiv(query, max_results=max_results, page_size=page_size, session=session, **search_kwargs)
+        while True:
+            paper = await loop.run_in_executor(net_executor, next, papers, _DONE)
+            if paper is _DONE:
+                break
+            report["found"] += 1
+            if skip_duplicates and await loop.run_in_executor(store_executor, storage.is_duplicate, paper):
+                report["skipped"] += 1
+                continue
+            await download_q.put(paper)
+        for _ in range(download_workers):
+            await download_q.put(_DONE)
+
+    async def download_worker():
+        while True:
+            paper = await download_q.get()
+            if paper is _DONE:
+                return
+            save_path = os.path.join(pdf_dir, pdf_filename(paper["id"]))
+            try:
+                await loop.run_in_executor(net_executor, lambda: download_pdf(paper["pdf_url"], save_path, session=session))
+            except Exception as e:
+                # 取得に失敗した論文は保存しない（次回の実行で再取得される）
+                report["failed"] += 1
+                report["errors"].append({"id": paper["id"], "error": str(e)})
+                continue
+            report["downloaded"] += 1
+            await store_q.put(dict(paper, pdf_path=save_path))
+
+    async def download_stage():
+        await asyncio.gather(*(download_worker() for _ in range(download_workers)))
+        await store_q.put(_DONE)
+
+    async def store_stage():
+        # キューに溜まっている分をまとめてadd_manyで1回の書き込みにする
+        done = False
+        while not done:
+            batch = [await store_q.get()]
+            while not store_q.empty():
+                batch.append(store_q.get_nowait())
+            if batch[-1] is _DONE:
+                batch.pop()
+                done = True
+            if batch:
+                counts = await loop.run_in_executor(store_executor, storage.add_many, batch)
+                report["stored"] += counts["inserted"] + counts["updated"]
+
+    tasks = [asyncio.ensure_future(stage()) for stage in (search_stage, download_stage, store_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # キャンセル・例外時は全段を止め、実行中のStorage操作の完了を待ってから抜ける
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        net_executor.shutdown(wait=False, cancel_futures=True)
+        store_executor.shutdown(wait=True)
+    return report
+
+
+def run_harvest(query, storage, pdf_dir, **kwargs):
+    return asyncio.run(harvest(query, storage, pdf_dir, **kwargs))
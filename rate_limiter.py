@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス内のみで共有
+    fcntl = None
+
+
+def parse_retry_after(value):
+    # Retry-Afterヘッダ（秒数またはHTTP日付）を待機秒数に変換する
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    # トークンバケット方式のレートリミッタ
+    # state_pathを指定すると状態をファイルに置き、ファイルロックで同一ホストの複数プロセス間で共有する
+    # 429を受けたらRetry-Afterと指数バックオフ（ジッタ付き）の長い方だけ全ワーカーを止める
+    def __init__(self, rate=1 / 3, burst=1, state_path=None, max_retries=5, backoff_base=1.0, backoff_max=60.0):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self.state_path = state_path
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._state = {"tokens": float(burst), "updated": time.time(), "blocked_until": 0.0}
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock:
+            if self.state_path is None:
+                yield self._state
+                return
+            with open(self.state_path + ".lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    state = self._read_state()
+                    yield state
+                    tmp = self.state_path + ".tmp"
+                    with open(tmp, "w") as f:
+                        json.dump(state, f)
+                    os.replace(tmp, self.state_path)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if all(k in state for k in ("tokens", "updated", "blocked_until")):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"tokens": float(self.burst), "updated": time.time(), "blocked_until": 0.0}
+
+    def acquire(self):
+        # トークンを1つ取得できるまで待つ
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                elapsed = max(0.0, now - state["updated"])
+                state["tokens"] = min(float(self.burst), state["tokens"] + elapsed * self.rate)
+                state["updated"] = now
+                if now >= state["blocked_until"] and state["tokens"] >= 1:
+                    state["tokens"] -= 1
+                    return
+                wait = max(state["blocked_until"] - now, (1 - state["tokens"]) / self.rate)
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        # 全ワーカーの次回リクエストをseconds秒後以降に遅らせる
+        with self._locked_state() as state:
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def on_rate_limited(self, attempt, retry_after_header=None):
+        delay = self.backoff(attempt, parse_retry_after(retry_after_header))
+        self.penalize(delay)
+        return delay
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+
+class ResponseCache:
+    # arXiv APIの応答（パース済みの論文リスト）をディスクに保存するキャッシュ
+    # ttl秒以内は再取得せず、期限切れ後はETag/Last-Modifiedで再検証する
+    # 合計サイズがmax_bytesを超えたら最終利用が古いものから削除する（LRU）
+    def __init__(self, cache_dir, ttl=3600, max_bytes=50 * 1024 * 1024):
+        if os.path.exists(cache_dir) and not os.path.isdir(cache_dir):
+            raise Exception("Cache path is not a directory.")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+
+    def key(self, params):
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 最終利用時刻をLRUの順序に使う
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def put(self, key, results, etag=None, last_modified=None):
+        entry = {"fetched_at": time.time(), "etag": etag, "last_modified": last_modified, "results": results}
+        path = self._path(key)
+        # 同じキーを複数のワーカーが同時に書いても衝突しないよう、一時ファイルは書き込みごとに別名にする
+        fd, tmp = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._evict()
+
+    def touch(self, key, entry):
+        # 304応答で鮮度だけを更新する
+        self.put(key, entry["results"], entry.get("etag"), entry.get("last_modified"))
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._stats["evictions"] += 1
+
+    def record(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    # Storageの検索結果をプロセス内に保持するキャッシュ
+    # 各エントリは推定サイズを持ち、合計がmax_bytesを超えたら最終利用が古いものから捨てる（LRU）
+    # キーに世代番号を含めるので、古い世代のエントリは参照されないまま追い出される
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        # (見つかったか, 値)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[0]
+
+    def put(self, key, value, size):
+        # max_bytesより大きい値は保持しない
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,571 @@
+# Storageと同じ公開メソッドを持つSQLite版のストレージ
+# 使い方（JSONからの移行）: python sqlite_storage.py papers.json papers.db
+import os
+import sys
+import json
+import difflib
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from fulltext_index import (
+    PaperShadow, authors_key, bm25_scorer, compile_query, decode_cursor, decorate_results, encode_cursor,
+    iter_matches, normalize_text, paper_shadow, query_fingerprint, rank_by_score, regex_prefilter_unsafe,
+    regex_time_limit, search_papers,
+)
+from minhash import MinHashLSH, stable_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    authors_norm TEXT NOT NULL,
+    authors_csv TEXT NOT NULL,
+    summary_norm TEXT NOT NULL,
+    authors_key TEXT NOT NULL,
+    regex_unsafe INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS papers_title_norm ON papers(title_norm);
+CREATE INDEX IF NOT EXISTS papers_authors_key ON papers(authors_key);
+CREATE TABLE IF NOT EXISTS access (
+    id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS access_count ON access(count DESC, id);
+CREATE TABLE IF NOT EXISTS summary_lsh (
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (band, key, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS summary_lsh_seq ON summary_lsh(seq);
+"""
+
+# 正規化済みの列をtrigramで索引し、3文字以上の部分一致をFTS5で絞り込む
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title_norm, authors_norm, summary_norm, content='papers', content_rowid='seq', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts(rowid, title_norm, authors_norm, summary_norm)
+    VALUES (new.seq, new.title_norm, new.authors_norm, new.summary_norm);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title_norm, authors_norm, summary_norm)
+    VALUES ('delete', old.seq, old.title_norm, old.authors_norm, old.summary_norm);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title_norm, authors_norm, summary_norm)
+    VALUES ('delete', old.seq, old.title_norm, old.authors_norm, old.summary_norm);
+    INSERT INTO papers_fts(rowid, title_norm, authors_norm, summary_norm)
+    VALUES (new.seq, new.title_norm, new.authors_norm, new.summary_norm);
+END;
+"""
+
+# authors_csvはFTS5に持たないので、カンマを含まない語はauthors_normで絞り込む
+_FTS_COLUMNS = {
+    "title_norm": "title_norm",
+    "authors_norm": "authors_norm",
+    "authors_csv": "authors_norm",
+    "summary_norm": "summary_norm",
+}
+
+_SHADOW_COLUMNS = "title_norm, authors_norm, authors_csv, summary_norm"
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SQLiteStorage:
+    # Storageの置き換え。論文はJSONのまま保存し、正規化済みの列・FTS5・索引で検索する
+    # WALモードなので他の接続（別プロセス）からの読み込みは書き込み中も止まらない
+    def __init__(self, db_path, fsync="always", timeout=30.0):
+        if os.path.isdir(db_path):
+            raise Exception("Storage path is a directory.")
+        if fsync not in ("always", "never"):
+            raise ValueError("fsync must be 'always' or 'never'.")
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._lsh = MinHashLSH(hash_func=stable_hash)
+        try:
+            self._conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=" + ("FULL" if fsync == "always" else "OFF"))
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+        except sqlite3.DatabaseError:
+            raise Exception("Storage file is broken or unreadable.")
+        # FTS5（trigram）が使えないSQLiteではinstrによる走査で代用する
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False
+
+    def _migrate(self):
+        # regex_unsafe列の無い古いデータベースには列を足し、既存の行の値を埋める
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(papers)")}
+        if "regex_unsafe" not in columns:
+            with self._write() as conn:
+                conn.execute("ALTER TABLE papers ADD COLUMN regex_unsafe INTEGER NOT NULL DEFAULT 0")
+                conn.executemany(
+                    "UPDATE papers SET regex_unsafe = 1 WHERE seq = ?",
+                    [(seq,) for seq, data in conn.execute("SELECT seq, data FROM papers").fetchall()
+                     if regex_prefilter_unsafe(json.loads(data))],
+                )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS papers_regex_unsafe ON papers(seq) WHERE regex_unsafe = 1")
+
+    @contextmanager
+    def _write(self):
+        # 書き込みは1トランザクションにまとめ、開始時に書き込みロックを取る
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def compact(self):
+        # WALをデータベース本体へ書き戻して切り詰める
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _contains(self, term, columns):
+        # 正規化済みの語をcolumnsのいずれかに含み得る行の条件 (SQL, 引数)
+        # FTS5で絞った場合は候補なので、最終判定は呼び出し側で行う
+        if self._fts and len(term) >= 3 and "," not in term:
+            cols = " ".join(sorted({_FTS_COLUMNS[c] for c in columns}))
+            return (
+                "seq IN (SELECT rowid FROM papers_fts WHERE papers_fts MATCH ?)",
+                ["{%s} : %s" % (cols, _fts_phrase(term))],
+            )
+        return "(" + " OR ".join("instr(%s, ?) > 0" % c for c in columns) + ")", [term] * len(columns)
+
+    def _select(self, where=None, params=()):
+        # 条件に合う行を (論文, 正規化済みフィールド) で追加順に返す
+        sql = "SELECT data, " + _SHADOW_COLUMNS + " FROM papers"
+        if where:
+            sql += " WHERE " + where
+        sql += " ORDER BY seq"
+        return [(json.loads(row[0]), PaperShadow(*row[1:])) for row in self._query(sql, params)]
+
+    def _iter_select(self, where=None, params=(), after=0, batch=256):
+        # _selectの逐次版。seqがafterより後の行を (seq, 論文, 正規化済みフィールド) でbatch件ずつ読む
+        sql = "SELECT seq, data, " + _SHADOW_COLUMNS + " FROM papers WHERE seq > ?"
+        if where:
+            sql += " AND (" + where + ")"
+        sql += " ORDER BY seq LIMIT ?"
+        while True:
+            rows = self._query(sql, [after] + list(params) + [batch])
+            for row in rows:
+                yield row[0], json.loads(row[1]), PaperShadow(*row[2:])
+            if len(rows) < batch:
+                return
+            after = rows[-1][0]
+
+    def _put(self, conn, paper, old_id=None):
+        # 1件を挿入または置き換える（既存の行は並び順を保つ）
+        sh = paper_shadow(paper)
+        row = (
+            paper["id"], json.dumps(paper, ensure_ascii=False), sh.title, sh.authors, sh.authors_csv, sh.summary,
+            json.dumps(authors_key(paper.get("authors")), ensure_ascii=False), int(regex_prefilter_unsafe(paper)),
+        )
+        if old_id is None:
+            conn.execute(
+                "INSERT INTO papers (id, data, title_norm, authors_norm, authors_csv, summary_norm, authors_key, "
+                "regex_unsafe) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data, "
+                "title_norm = excluded.title_norm, authors_norm = excluded.authors_norm, "
+                "authors_csv = excluded.authors_csv, summary_norm = excluded.summary_norm, "
+                "authors_key = excluded.authors_key, regex_unsafe = excluded.regex_unsafe",
+                row,
+            )
+        else:
+            conn.execute(
+                "UPDATE papers SET id = ?, data = ?, title_norm = ?, authors_norm = ?, authors_csv = ?, "
+                "summary_norm = ?, authors_key = ?, regex_unsafe = ? WHERE id = ?",
+                row + (old_id,),
+            )
+        seq = conn.execute("SELECT seq FROM papers WHERE id = ?", (paper["id"],)).fetchone()[0]
+        conn.execute("DELETE FROM summary_lsh WHERE seq = ?", (seq,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO summary_lsh (band, key, seq) VALUES (?, ?, ?)",
+            [(b, k, seq) for b, k in enumerate(self._lsh.band_keys(sh.summary))],
+        )
+
+    def _remove(self, conn, paper_id):
+        row = conn.execute("SELECT seq FROM papers WHERE id = ?", (paper_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM summary_lsh WHERE seq = ?", row)
+        conn.execute("DELETE FROM papers WHERE seq = ?", row)
+        return True
+
+    def _exists(self, conn, paper_id):
+        return conn.execute("SELECT 1 FROM papers WHERE id = ?", (paper_id,)).fetchone() is not None
+
+    def add(self, paper):
+        with self._write() as conn:
+            self._put(conn, paper)
+
+    def add_many(self, papers, on_conflict="replace"):
+        # 1トランザクションでまとめて反映する
+        if on_conflict not in ("replace", "skip"):
+            raise ValueError("on_conflict must be 'replace' or 'skip'.")
+        # 途中で失敗して一部だけ反映されないよう、先に全件を検証する
+        papers = list(papers)
+        if not all(isinstance(p, dict) and "id" in p for p in papers):
+            raise ValueError("Each paper must be a dict with an 'id'.")
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        with self._write() as conn:
+            for paper in papers:
+                if self._exists(conn, paper["id"]):
+                    if on_conflict == "skip":
+                        counts["skipped"] += 1
+                        continue
+                    counts["updated"] += 1
+                else:
+                    counts["inserted"] += 1
+                self._put(conn, paper)
+        return counts
+
+    def get_all(self):
+        return [json.loads(row[0]) for row in self._query("SELECT data FROM papers ORDER BY seq")]
+
+    def get_by_id(self, paper_id):
+        rows = self._query("SELECT data FROM papers WHERE id = ?", (paper_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def search(self, keyword):
+        norm_kw = normalize_text(keyword)
+        where, params = self._contains(norm_kw, ["title_norm", "authors_csv", "summary_norm"])
+        return [
+            p for p, sh in self._select(where, params)
+            if norm_kw in sh.title or norm_kw in sh.authors_csv or norm_kw in sh.summary
+        ]
+
+    def update(self, paper_id, new_paper):
+        with self._write() as conn:
+            if not self._exists(conn, paper_id):
+                raise Exception("Paper not found for update.")
+            # Storage.updateと同じく、別の論文が使っているIDへの変更は拒否する
+            new_id = new_paper.get("id")
+            if new_id != paper_id and self._exists(conn, new_id):
+                raise Exception("Paper id already exists.")
+            self._put(conn, new_paper, old_id=paper_id)
+
+    def delete(self, paper_id):
+        with self._write() as conn:
+            if not self._remove(conn, paper_id):
+                raise Exception("Paper not found for delete.")
+
+    def record_access(self, paper_id):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO access (id, count) VALUES (?, 1) ON CONFLICT(id) DO UPDATE SET count = count + 1",
+                (paper_id,),
+            )
+
+    def get_access_count(self, paper_id):
+        rows = self._query("SELECT count FROM access WHERE id = ?", (paper_id,))
+        return rows[0][0] if rows else 0
+
+    def reset_access(self, paper_id):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO access (id, count) VALUES (?, 0) ON CONFLICT(id) DO UPDATE SET count = 0",
+                (paper_id,),
+            )
+
+    def get_ranking(self, order="popular", limit=None, filter_keyword=None):
+        where, params = None, []
+        if filter_keyword:
+            norm_kw = normalize_text(filter_keyword)
+            where, params = self._contains(norm_kw, ["title_norm"])
+            # FTS5の候補は部分一致を確かめてから並べる
+            where += " AND instr(title_norm, ?) > 0"
+            params.append(norm_kw)
+        if order == "popular":
+            sql = "SELECT p.data FROM papers p LEFT JOIN access a ON a.id = p.id"
+            if where:
+                sql += " WHERE " + where
+            sql += " ORDER BY COALESCE(a.count, 0) DESC, p.id"
+        else:
+            sql = "SELECT data FROM papers"
+            if where:
+                sql += " WHERE " + where
+            sql += " ORDER BY seq DESC" if order == "newest" else " ORDER BY seq"
+        if limit:
+            sql += " LIMIT %d" % limit
+        return [json.loads(row[0]) for row in self._query(sql, params)]
+
+    def _fulltext_where(self, terms, mode, regex=False):
+        # fulltext_searchの候補条件（termsはcompile_queryの絞り込み用の語）。絞り込めなければ (None, [])
+        # 正規表現では正規化で形が変わる行（regex_unsafe）も常に候補に含める
+        if mode not in ("AND", "OR") or not terms:
+            return None, []
+        if mode == "OR" and not all(terms):
+            return None, []
+        conds, params = [], []
+        for kw in terms:
+            if not kw:
+                continue
+            cond, args = self._contains(kw, ["title_norm", "authors_norm", "summary_norm"])
+            conds.append(cond)
+            params.extend(args)
+        if not conds:
+            return None, []
+        where = (" %s " % mode).join(conds)
+        if regex:
+            where = "(%s) OR regex_unsafe = 1" % where
+        return where, params
+
+    def _iter_candidates(self, where, params, after=0):
+        # 候補の論文を逐次返し、その正規化済みフィールドをshadow_ofで引けるようにする
+        shadows = {}
+
+        def papers():
+            for _, p, sh in self._iter_select(where, params, after):
+                shadows[id(p)] = sh
+                yield p
+        return papers(), lambda p: shadows[id(p)]
+
+    def _scorer(self, query, exact, regex):
+        # Storageと同じBM25。文書数・平均長・文書頻度はその場でSQLで数える
+        columns = ["title_norm", "authors_norm", "summary_norm"]
+        row = self._query(
+            "SELECT COUNT(*), " + ", ".join("SUM(length(%s))" % c for c in columns) + " FROM papers"
+        )[0]
+        doc_count = row[0]
+        avg_lengths = [(total or 0) / doc_count if doc_count else 0 for total in row[1:]]
+        doc_freqs = []
+        for term in query.terms:
+            if term:
+                # FTS5の候補はinstrで確かめてから数える
+                cond, args = self._contains(term, columns)
+                verify = " OR ".join("instr(%s, ?) > 0" % c for c in columns)
+                doc_freqs.append(self._query(
+                    "SELECT COUNT(*) FROM papers WHERE %s AND (%s)" % (cond, verify), args + [term] * len(columns),
+                )[0][0])
+            else:
+                doc_freqs.append(doc_count)
+        return bm25_scorer(query.keywords, doc_count, avg_lengths, doc_freqs, exact, query.patterns if regex else None)
+
+    def fulltext_search(self, keyword, exact=False, regex=False, mode="OR", order_by_score=False, highlight=False, limit=None, offset=0, return_count=False, snippets=None, snippet_width=160, **kwargs):
+        # 候補をSQL（FTS5）で絞り、照合以降はStorageと同じ処理に渡す
+        query = compile_query(keyword, regex)
+        papers, shadow_of = self._iter_candidates(*self._fulltext_where(query.terms, mode, regex))
+        return search_papers(
+            papers, shadow_of, query.keywords, query.raw_keywords, exact=exact, regex=regex,
+            mode=mode, order_by_score=order_by_score, highlight=highlight, limit=limit, offset=offset,
+            return_count=return_count, snippets=snippets, snippet_width=snippet_width, patterns=query.patterns,
+            score=self._scorer(query, exact, regex) if order_by_score else None,
+        )
+
+    def fulltext_search_page(self, keyword, page_size=20, cursor=None, with_total=False, exact=False, regex=False,
+                             mode="OR", order_by_score=False, highlight=False, snippets=None, snippet_width=160):
+        # Storage.fulltext_search_pageと同じ。並べ替えが無ければカーソルには直前に返した行のseqを持つ
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise ValueError("page_size must be a positive integer.")
+        query = compile_query(keyword, regex)
+        keywords, raw_keywords, patterns = query.keywords, query.raw_keywords, query.patterns
+        fingerprint = query_fingerprint(keyword, exact, regex, mode, order_by_score)
+        start, _ = decode_cursor(cursor, fingerprint) if cursor is not None else (0, None)
+        with regex_time_limit(regex):
+            where, params = self._fulltext_where(query.terms, mode, regex)
+            total = None
+            next_cursor = None
+            if order_by_score:
+                papers, shadow_of = self._iter_candidates(where, params)
+                matches = list(iter_matches(papers, shadow_of, keywords, raw_keywords, exact, regex, mode, patterns))
+                ranked = rank_by_score(matches, self._scorer(query, exact, regex), start + page_size)
+                page = [p for p, _ in ranked[start:]]
+                if start + page_size < len(matches):
+                    next_cursor = encode_cursor(fingerprint, start + page_size)
+                total = len(matches)
+            else:
+                page = []
+                last_seq = None
+                rows = {}
+
+                def papers():
+                    for seq, p, sh in self._iter_select(where, params, start, batch=page_size + 1):
+                        rows[id(p)] = seq, sh
+                        yield p
+                for p, _ in iter_matches(papers(), lambda p: rows[id(p)][1], keywords, raw_keywords, exact, regex,
+                                         mode, patterns):
+                    if len(page) == page_size:
+                        next_cursor = encode_cursor(fingerprint, last_seq)
+                        break
+                    page.append(p)
+                    last_seq = rows[id(p)][0]
+                if with_total:
+                    papers, shadow_of = self._iter_candidates(where, params)
+                    total = sum(1 for _ in iter_matches(
+                        papers, shadow_of, keywords, raw_keywords, exact, regex, mode, patterns,
+                    ))
+            results = decorate_results(
+                [dict(p) for p in page], keywords, raw_keywords, regex, highlight, snippets, snippet_width,
+            )
+        return {"results": results, "cursor": next_cursor, "total": total}
+
+    def _dedup_keys(self, paper):
+        pid = paper.get("id") or None
+        title = paper.get("title")
+        title_key = normalize_text(title) if title and isinstance(title, str) else None
+        authors = paper.get("authors")
+        return pid, title_key, (authors_key(authors) if authors else None)
+
+    def is_duplicate(self, paper):
+        pid, title_key, auth_key = self._dedup_keys(paper)
+        conds, params = [], []
+        if pid is not None:
+            conds.append("id = ?")
+            params.append(pid)
+        if title_key is not None:
+            conds.append("title_norm = ?")
+            params.append(title_key)
+        if auth_key is not None:
+            conds.append("authors_key = ?")
+            params.append(json.dumps(auth_key, ensure_ascii=False))
+        if not conds:
+            return False
+        return bool(self._query("SELECT 1 FROM papers WHERE " + " OR ".join(conds) + " LIMIT 1", params))
+
+    def filter_new(self, papers):
+        # 既存論文とも、同じバッチ内の先行論文とも重複しないものだけを返す
+        seen_ids, seen_titles, seen_authors = set(), set(), set()
+        result = []
+        for paper in papers:
+            if self.is_duplicate(paper):
+                continue
+            pid, title_key, auth_key = self._dedup_keys(paper)
+            if (pid is not None and pid in seen_ids) or \
+                    (title_key is not None and title_key in seen_titles) or \
+                    (auth_key is not None and auth_key in seen_authors):
+                continue
+            for seen, key in ((seen_ids, pid), (seen_titles, title_key), (seen_authors, auth_key)):
+                if key is not None:
+                    seen.add(key)
+            result.append(paper)
+        return result
+
+    def find_duplicates(self, paper, summary_threshold=0.8):
+        # ID・タイトル・著者の部分一致とsummaryのLSHバンドで候補を絞り、Storageと同じ条件で判定する
+        norm_title = normalize_text(paper.get("title", ""))
+        norm_authors = [normalize_text(a) for a in paper.get("authors", [])]
+        norm_summary = normalize_text(paper.get("summary", ""))
+        conds, params = [], []
+        if paper.get("id"):
+            conds.append("id = ?")
+            params.append(paper.get("id"))
+        for term, column in [(norm_title, "title_norm")] + [(a, "authors_csv") for a in norm_authors]:
+            if term or column == "authors_csv":
+                cond, args = self._contains(term, [column])
+                conds.append(cond)
+                params.extend(args)
+        band_keys = self._lsh.band_keys(norm_summary)
+        if band_keys:
+            conds.append(
+                "seq IN (SELECT seq FROM summary_lsh WHERE (band, key) IN (VALUES "
+                + ", ".join("(?, ?)" for _ in band_keys) + "))"
+            )
+            for b, k in enumerate(band_keys):
+                params.extend((b, k))
+        if not conds:
+            return []
+        result = []
+        for p, sh in self._select(" OR ".join(conds), params):
+            if paper.get("id") and p.get("id") == paper.get("id"):
+                result.append(p)
+            elif norm_title and norm_title in sh.title:
+                result.append(p)
+            elif norm_authors and any(a in sh.authors_csv for a in norm_authors):
+                result.append(p)
+            elif norm_summary and \
+                    difflib.SequenceMatcher(None, norm_summary, sh.summary).ratio() >= summary_threshold:
+                result.append(p)
+        return result
+
+    def find_duplicates_many(self, papers, summary_threshold=0.8):
+        return [self.find_duplicates(p, summary_threshold=summary_threshold) for p in papers]
+
+
+def migrate_from_json(json_path, db_path):
+    # Storageのファイル一式（スナップショット・アクセス数・ジャーナル）をSQLiteへ1トランザクションで移す
+    with open(json_path, "r") as f:
+        papers = json.load(f)
+    if not isinstance(papers, list):
+        raise Exception("Storage file format invalid.")
+    access = {}
+    if os.path.exists(json_path + ".access.json"):
+        with open(json_path + ".access.json", "r") as f:
+            access = json.load(f)
+    store = SQLiteStorage(db_path)
+    try:
+        with store._write() as conn:
+            for paper in papers:
+                store._put(conn, paper)
+            journal_path = json_path + ".journal"
+            if os.path.exists(journal_path):
+                with open(journal_path, "rb") as f:
+                    for line in f:
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError
+                            rec = json.loads(line.decode("utf-8"))
+                        except ValueError:
+                            # 書き込み途中の末尾行はStorageと同じく捨てる
+                            break
+                        _apply_journal_record(store, conn, rec, access)
+            conn.executemany(
+                "INSERT INTO access (id, count) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET count = excluded.count",
+                list(access.items()),
+            )
+        return {"papers": store._query("SELECT COUNT(*) FROM papers")[0][0], "access": len(access)}
+    finally:
+        store.close()
+
+
+def _apply_journal_record(store, conn, rec, access):
+    op = rec["op"]
+    if op == "add":
+        store._put(conn, rec["paper"])
+    elif op == "add_many":
+        for paper in rec["papers"]:
+            store._put(conn, paper)
+    elif op == "update":
+        if store._exists(conn, rec["id"]):
+            store._put(conn, rec["paper"], old_id=rec["id"])
+    elif op == "delete":
+        store._remove(conn, rec["id"])
+    elif op == "access":
+        access[rec["id"]] = rec["count"]
+    elif op == "access_many":
+        access.update(rec["counts"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate a JSON Storage file to SQLiteStorage.")
+    parser.add_argument("json_path")
+    parser.add_argument("db_path")
+    args = parser.parse_args(argv)
+    counts = migrate_from_json(args.json_path, args.db_path)
+    print(f"migrated {counts['papers']} papers and {counts['access']} access counts to {args.db_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,238 +1,845 @@
 import os
+import sys
 import json
+import stat
+import time
+import heapq
+import atexit
+import shutil
+import inspect
+import tempfile
+import weakref
+import functools
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from fulltext_index import (
+    NgramIndex, authors_key, bm25_scorer, compile_query, decode_cursor, decorate_results, encode_cursor,
+    iter_matches, normalize_text, paper_shadow, query_fingerprint, rank_by_score, regex_prefilter_unsafe,
+    regex_time_limit, search_papers, shadow_size,
+)
+from minhash import MinHashLSH
+from result_cache import ResultCache
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス内のみで排他
+    fcntl = None
+
+
+def _fsync_dir(path):
+    # os.replaceによるファイル名の付け替えを永続化する（ディレクトリをopenできないOSでは省略）
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# 新規作成するファイルの権限（mkstempは0600で作るので、openで作った場合と同じにする）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# .bakの付け替えと本体の差し替えを1組にする（並行して書いても.bakは常に直前の世代）
+_replace_lock = threading.Lock()
+
+
+def _write_atomic(path, text, fsync=True):
+    # 一時ファイルに書いてからos.replaceで差し替える。書き込み途中で落ちても元のファイルは壊れない
+    # 差し替え前の内容はpath + ".bak"に1世代だけ残す
+    # 一時ファイルは書き込みごとに別名なので、複数のスレッドが同時に書いても衝突しない
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        with _replace_lock:
+            if os.path.exists(path):
+                bak_tmp = tmp + ".bak"
+                try:
+                    os.link(path, bak_tmp)
+                except OSError:
+                    shutil.copyfile(path, bak_tmp)
+                os.replace(bak_tmp, path + ".bak")
+            os.replace(tmp, path)
+    except BaseException:
+        for leftover in (tmp, tmp + ".bak"):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+        raise
+    if fsync:
+        _fsync_dir(path)
+
+
+def _load_json(path):
+    # 本体が読めなければ1世代前（.bak）を使う。どちらも読めなければ最後の例外を送出
+    error = None
+    for candidate in (path, path + ".bak"):
+        try:
+            with open(candidate, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            error = error or e
+    raise error
+
+
+def _file_sig(path):
+    # 変更検出用の (inode, サイズ, 更新時刻)。os.replaceで差し替えるとinodeが変わる
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _synced(exclusive):
+    # shared=Trueのとき、ファイルロックを取り他プロセスの変更を取り込んでから実行する
+    # 書き込み系は排他ロック、読み込み系は共有ロック
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.shared:
+                return method(self, *args, **kwargs)
+            with self._file_lock(exclusive):
+                self._refresh()
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _cached(owned=False, popular=None, normalize=None):
+    # result_cache_bytesを指定したとき、結果を (メソッド名, 正規化した引数, 世代番号) をキーに再利用する
+    # 世代番号は論文の変更で、popular(引数)が真なら（人気順）アクセス数の変更でも進む
+    # owned=Trueの結果（論文のコピー）は呼び出し側が書き換えてもよいよう、保存時と返す時にコピーする
+    # normalizeは引数名→同じ結果になる値への変換
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self._result_cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            del params["self"]
+            for name, fn in (normalize or {}).items():
+                params[name] = fn(params[name])
+            generation = (self._generation, self._access_generation if popular and popular(params) else None)
+            try:
+                key = (method.__name__, _freeze(params), generation)
+                hash(key)
+            except TypeError:  # ハッシュできない引数はキャッシュしない
+                return method(self, *args, **kwargs)
+            found, value = cache.get(key)
+            if found:
+                return _copy_result(value) if owned else _copy_result(value, papers=False)
+            value = method(self, *args, **kwargs)
+            stored = _copy_result(value, papers=owned)
+            cache.put(key, stored, _result_size(stored, owned))
+            return value
+        return wrapper
+    return decorator
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return ("dict",) + tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _copy_result(value, papers=True):
+    # 結果（論文のリスト、またはreturn_count=Trueの (リスト, 件数)）のリストを作り直す。papersなら論文もコピー
+    if isinstance(value, tuple):
+        return (_copy_result(value[0], papers),) + value[1:]
+    if papers:
+        return [dict(p) for p in value]
+    return list(value)
+
+
+def _result_size(value, owned):
+    # キャッシュが増やすメモリの推定。論文がStorage内のものと共有ならリスト本体だけ
+    if isinstance(value, tuple):
+        value = value[0]
+    size = sys.getsizeof(value)
+    if owned:
+        for p in value:
+            size += sys.getsizeof(p) + sum(sys.getsizeof(v) for v in p.values())
+    return size
+
+
+# アクセス数を溜めているStorage。終了時にまとめて書き出す
+_buffered_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_buffered_stores():
+    for store in list(_buffered_stores):
+        try:
+            store.flush()
+        except Exception:
+            pass
+
+
+def _count_up(counts, key):
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _count_down(counts, key):
+    n = counts.get(key, 0) - 1
+    if n > 0:
+        counts[key] = n
+    else:
+        counts.pop(key, None)
+
 
 class Storage:
-    def __init__(self, json_path):
+    # 論文と全文検索のインデックスは全件メモリに持ち、開くたびにJSONから作り直す（数万件規模まで）
+    # それより大きいコレクションはインデックスをファイルに持つSQLiteStorageを使う
+    # shared=Trueでは同じjson_pathを開く複数プロセスの間でファイルロックを取り、
+    # 他プロセスの書き込みを検出して取り込んでから読み書きする（変更が無ければ再読み込みしない）
+    # buffer_access=Trueではrecord_accessの増分をメモリに溜め、flush_every件またはflush_interval秒ごと
+    # （判定はrecord_access時）とflush()・close()・プロセス終了時にまとめて書き出す
+    # ranking_index=Trueでは人気順の順位表を保持し、record_accessのたびに更新する
+    # result_cache_bytes>0ではsearch・fulltext_search・get_rankingの結果を合計その推定バイト数まで保持し、
+    # 変更があるまで同じ呼び出しに使い回す（統計はresult_cache_stats()）
+    def __init__(self, json_path, journal=False, fsync="always", compact_every=1000, shared=False,
+                 buffer_access=False, flush_every=100, flush_interval=5.0, ranking_index=False,
+                 result_cache_bytes=0):
         if os.path.isdir(json_path):
             raise Exception("Storage path is a directory.")
+        if fsync not in ("always", "never"):
+            raise ValueError("fsync must be 'always' or 'never'.")
         self.json_path = json_path
         self._access_path = json_path + ".access.json"
-        if not os.path.exists(self.json_path):
+        self._journal_path = json_path + ".journal"
+        self._generation_path = json_path + ".gen"
+        self.journal = journal
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self.shared = shared
+        self.buffer_access = buffer_access
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.ranking_index = ranking_index
+        self._access_pending = {}
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._journal_file = None
+        self._journal_count = 0
+        self._journal_offset = 0
+        self._sigs = None
+        self._thread_lock = threading.RLock()
+        self._lock_held = False
+        self._lock_exclusive = False
+        # 論文・アクセス数の変更ごとに進む世代番号（結果キャッシュのキーに使う）
+        self._generation = 0
+        self._access_generation = 0
+        self._result_cache = ResultCache(result_cache_bytes) if result_cache_bytes else None
+        if shared:
+            with self._file_lock(True):
+                self._load()
+        else:
+            self._load()
+        if buffer_access:
+            _buffered_stores.add(self)
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        # 同じスレッドで入れ子になった場合は外側のロックをそのまま使う
+        with self._thread_lock:
+            if self._lock_held or fcntl is None:
+                yield
+                return
+            with open(self.json_path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._lock_held = True
+                self._lock_exclusive = exclusive
+                try:
+                    yield
+                finally:
+                    self._lock_held = False
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        if not os.path.exists(self.json_path) and not os.path.exists(self.json_path + ".bak"):
             with open(self.json_path, "w") as f:
                 json.dump([], f)
         try:
-            with open(self.json_path, "r") as f:
-                self._data = json.load(f)
+            self._data = _load_json(self.json_path)
         except Exception:
             raise Exception("Storage file is broken or unreadable.")
         if not isinstance(self._data, list):
             raise Exception("Storage file format invalid.")
         # アクセス数の永続化
-        if os.path.exists(self._access_path):
-            try:
-                with open(self._access_path, "r") as f:
-                    self._access = json.load(f)
-            except Exception:
-                self._access = {}
-        else:
+        try:
+            self._access = _load_json(self._access_path)
+        except Exception:
             self._access = {}
+        self._access_generation += 1
+        self._rank = None
+        # ジャーナルが残っていればスナップショットに再適用
+        self._journal_count = 0
+        self._journal_offset = 0
+        if os.path.exists(self._journal_path):
+            self._replay_journal()
+            if not self.journal and (not self.shared or fcntl is None or self._lock_exclusive):
+                # ジャーナルを使わないStorageは以後スナップショットだけを書くので、ここで畳み込んでおく
+                # （残すと次に開いたときに古い変更が再適用され、この後の書き込みが巻き戻る）
+                # _refreshから呼ばれるためcompact()（_synced経由）は使わない。共有ロック中は次の書き込みで畳み込む
+                self._compact()
+        self._sigs = self._current_sigs()
+
+    def _current_sigs(self):
+        return (_file_sig(self.json_path), _file_sig(self._access_path), _file_sig(self._journal_path),
+                self._read_generation())
+
+    def _read_generation(self):
+        # 書き込みごとに増える世代番号（更新時刻の粒度より短い間隔の書き込みも検出する）
+        if not self.shared:
+            return None
+        try:
+            with open(self._generation_path, "r") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _refresh(self):
+        # 他プロセスの変更を取り込む。スナップショットが変わっていれば読み直し、
+        # ジャーナルへの追記だけなら前回の位置から続きを再適用する
+        sigs = self._current_sigs()
+        if sigs == self._sigs:
+            return
+        data_sig, access_sig, journal_sig, _ = sigs
+        old_journal = self._sigs[2] if self._sigs else None
+        if self._journal_file is not None and (
+                journal_sig is None or journal_sig[0] != os.fstat(self._journal_file.fileno()).st_ino):
+            # 他プロセスがコンパクションしたジャーナルには追記しない
+            self._journal_file.close()
+            self._journal_file = None
+        if self._sigs is not None and (data_sig, access_sig) == self._sigs[:2] and \
+                journal_sig is not None and old_journal is not None and \
+                journal_sig[0] == old_journal[0] and journal_sig[1] >= self._journal_offset:
+            self._replay_journal(self._journal_offset)
+            self._sigs = self._current_sigs()
+        else:
+            self._load()
+
+    @property
+    def _data(self):
+        return self._papers
+
+    @_data.setter
+    def _data(self, papers):
+        # 直接差し替えられた場合もインデックスを作り直す
+        self._papers = papers
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        self._generation += 1
+        self._rank = None
+        self._index = {}
+        self._shadow = {}
+        self._shadow_bytes = 0
+        self._regex_unsafe = set()
+        self._text_index = NgramIndex()
+        self._df_cache = {}
+        self._lsh = None
+        self._title_counts = {}
+        self._authors_counts = {}
+        if isinstance(self._papers, list):
+            for i, p in enumerate(self._papers):
+                self._index[p.get("id")] = i
+                self._index_paper(p)
+
+    def _index_paper(self, paper):
+        self._generation += 1
+        sh = paper_shadow(paper)
+        self._shadow[paper.get("id")] = sh
+        self._shadow_bytes += shadow_size(sh)
+        self._text_index.add(paper.get("id"), (sh.title, sh.authors, sh.summary))
+        if regex_prefilter_unsafe(paper):
+            self._regex_unsafe.add(paper.get("id"))
+        self._df_cache.clear()
+        if self._lsh is not None:
+            self._lsh.add(paper.get("id"), sh.summary)
+        _count_up(self._title_counts, sh.title)
+        _count_up(self._authors_counts, authors_key(paper.get("authors")))
+        if self._rank is not None:
+            insort(self._rank, (-self._access_count(paper.get("id")), paper.get("id")))
+
+    def _unindex_paper(self, paper):
+        sh = self._shadow.pop(paper.get("id"), None)
+        if sh is None:
+            return
+        self._generation += 1
+        self._shadow_bytes -= shadow_size(sh)
+        _count_down(self._title_counts, sh.title)
+        _count_down(self._authors_counts, authors_key(paper.get("authors")))
+        self._text_index.remove(paper.get("id"), (sh.title, sh.authors, sh.summary))
+        self._regex_unsafe.discard(paper.get("id"))
+        self._df_cache.clear()
+        if self._lsh is not None:
+            self._lsh.remove(paper.get("id"))
+        if self._rank is not None:
+            del self._rank[bisect_left(self._rank, (-self._access_count(paper.get("id")), paper.get("id")))]
+
+    def _shadow_of(self, p):
+        # 正規化済みフィールドは追加・更新時に一度だけ計算したものを共有する
+        sh = self._shadow.get(p.get("id"))
+        if sh is None:
+            sh = paper_shadow(p)
+        return sh
+
+    def shadow_memory_usage(self):
+        return {"papers": len(self._shadow), "bytes": self._shadow_bytes}
+
     def _save(self):
-        with open(self.json_path, "w") as f:
-            json.dump(self._data, f, ensure_ascii=False)
-        with open(self._access_path, "w") as f:
-            json.dump(self._access, f, ensure_ascii=False)
+        self._save_data()
+        self._save_access()
 
-    def record_access(self, paper_id):
-        self._access[paper_id] = self._access.get(paper_id, 0) + 1
+    def _save_data(self):
+        # json.dumpは純Pythonのエンコーダを使うので、dumpsで一括変換してから書く
+        _write_atomic(self.json_path, json.dumps(self._data, ensure_ascii=False), self.fsync == "always")
+
+    def _save_access(self):
+        _write_atomic(self._access_path, json.dumps(self._access, ensure_ascii=False), self.fsync == "always")
+
+    def _replay_journal(self, start=0):
+        good_end = start
+        with open(self._journal_path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError
+                    rec = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    # 書き込み途中でクラッシュした末尾行は捨てる
+                    break
+                self._apply(rec)
+                self._journal_count += 1
+                good_end += len(line)
+        if good_end != os.path.getsize(self._journal_path):
+            with open(self._journal_path, "r+b") as f:
+                f.truncate(good_end)
+        self._journal_offset = good_end
+
+    def _apply(self, rec):
+        op = rec["op"]
+        if op == "add":
+            paper = rec["paper"]
+            idx = self._index.get(paper["id"])
+            if idx is not None:
+                self._unindex_paper(self._data[idx])
+                self._data[idx] = paper
+            else:
+                self._index[paper["id"]] = len(self._data)
+                self._data.append(paper)
+            self._index_paper(paper)
+        elif op == "update":
+            idx = self._index.get(rec["id"])
+            if idx is not None:
+                paper = rec["paper"]
+                self._unindex_paper(self._data[idx])
+                self._data[idx] = paper
+                if paper.get("id") != rec["id"]:
+                    del self._index[rec["id"]]
+                    self._index[paper.get("id")] = idx
+                self._index_paper(paper)
+        elif op == "delete":
+            # 後ろの論文の位置を詰め直すため、1件の削除でもO(N)かかる（大量削除はsqlite_storageを使う）
+            idx = self._index.pop(rec["id"], None)
+            if idx is not None:
+                self._unindex_paper(self._data.pop(idx))
+                for i in range(idx, len(self._data)):
+                    self._index[self._data[i].get("id")] = i
+        elif op == "add_many":
+            for paper in rec["papers"]:
+                self._apply({"op": "add", "paper": paper})
+        elif op == "access":
+            self._set_access(rec["id"], rec["count"])
+        elif op == "access_many":
+            for paper_id, count in rec["counts"].items():
+                self._set_access(paper_id, count)
+
+    def _search_candidates(self, keywords, mode):
+        # n-gramインデックスで候補を絞る（AND=積集合、OR=和集合）。絞れなければNone
+        result = None
+        for kw in keywords:
+            cands = self._text_index.candidates(kw)
+            if cands is None:
+                if mode == "OR":
+                    return None
+                continue
+            if result is None:
+                result = cands
+            elif mode == "AND":
+                result = result & cands
+            else:
+                result = result | cands
+        return result
+
+    def _commit(self, rec):
+        # ジャーナルモードでは1変更1行の追記のみ、通常モードは変わった方のファイルを書き直す
+        if not self.journal:
+            if os.path.exists(self._journal_path):
+                # 他プロセスのジャーナルが残っていれば、スナップショットだけ書くと後で再適用されて巻き戻る
+                self._compact()
+                return
+            if rec["op"] in ("access", "access_many"):
+                self._save_access()
+            else:
+                self._save_data()
+            self._mark_synced()
+            return
+        if self._journal_file is None:
+            self._journal_file = open(self._journal_path, "a", encoding="utf-8")
+        self._journal_file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._journal_file.flush()
+        if self.fsync == "always":
+            os.fsync(self._journal_file.fileno())
+        self._journal_count += 1
+        self._journal_offset = self._journal_file.tell()
+        self._mark_synced()
+        if self.compact_every and self._journal_count >= self.compact_every:
+            self.compact()
+
+    def _mark_synced(self):
+        # 世代番号を進め、自分の書き込みを他プロセスの変更と取り違えないよう書き込み直後の状態を覚える
+        if self.shared:
+            with open(self._generation_path, "w") as f:
+                f.write(str((self._read_generation() or 0) + 1))
+            self._sigs = self._current_sigs()
+
+    @_synced(exclusive=True)
+    def compact(self):
+        # ジャーナルの内容をJSONスナップショットへ畳み込み、ジャーナルを空にする
+        self._compact()
+
+    def _compact(self):
         self._save()
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        try:
+            os.remove(self._journal_path)
+        except FileNotFoundError:
+            pass
+        self._journal_count = 0
+        self._journal_offset = 0
+        self._mark_synced()
+
+    def close(self):
+        self.flush()
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def record_access(self, paper_id):
+        if not self.buffer_access:
+            self._record_access(paper_id)
+            return
+        with self._thread_lock:
+            old = self._access_count(paper_id)
+            self._access_pending[paper_id] = self._access_pending.get(paper_id, 0) + 1
+            self._pending_total += 1
+            self._rerank(paper_id, old)
+            due = self._pending_total >= self.flush_every or \
+                time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    @_synced(exclusive=True)
+    def _record_access(self, paper_id):
+        self._set_access(paper_id, self._access.get(paper_id, 0) + 1)
+        self._commit({"op": "access", "id": paper_id, "count": self._access[paper_id]})
+
+    @_synced(exclusive=True)
+    def flush(self):
+        # 溜めたアクセス数の増分を1回の書き込み（ジャーナルなら1行）で反映する
+        # 増分の取り出しから書き込みまでをスレッドロックの中で行い、並行するrecord_access・flushと混ざらないようにする
+        with self._thread_lock:
+            self._last_flush = time.monotonic()
+            if not self._access_pending:
+                return
+            pending = self._access_pending
+            self._access_pending = {}
+            self._pending_total = 0
+            counts = {}
+            for paper_id, n in pending.items():
+                counts[paper_id] = self._access.get(paper_id, 0) + n
+            self._access.update(counts)
+            self._commit({"op": "access_many", "counts": counts})
+
+    def _access_count(self, paper_id):
+        # 永続化済みの値に未反映の増分を足したアクセス数
+        return self._access.get(paper_id, 0) + self._access_pending.get(paper_id, 0)
+
+    def _set_access(self, paper_id, count):
+        old = self._access_count(paper_id)
+        self._access[paper_id] = count
+        self._rerank(paper_id, old)
+
+    def _rerank(self, paper_id, old_count):
+        # アクセス数の変化を人気順の順位表に反映する（順位表を作っていなければ何もしない）
+        self._access_generation += 1
+        if self._rank is None or paper_id not in self._index:
+            return
+        new_count = self._access_count(paper_id)
+        if new_count != old_count:
+            del self._rank[bisect_left(self._rank, (-old_count, paper_id))]
+            insort(self._rank, (-new_count, paper_id))
+
+    def _ranked(self):
+        # (-アクセス数, ID) の昇順に並んだ順位表。初回に作り、以降は変更に追従させる
+        if self._rank is None:
+            self._rank = sorted((-self._access_count(pid), pid) for pid in self._index)
+        return self._rank
 
+    def result_cache_stats(self):
+        # 結果キャッシュのヒット・ミス・追い出しの回数と、保持しているエントリ数・推定バイト数（無効ならNone）
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    @_synced(exclusive=False)
     def get_access_count(self, paper_id):
-        return self._access.get(paper_id, 0)
+        return self._access_count(paper_id)
 
+    @_synced(exclusive=True)
     def reset_access(self, paper_id):
+        old = self._access_count(paper_id)
+        if self._access_pending.pop(paper_id, None) is not None:
+            self._pending_total = sum(self._access_pending.values())
         self._access[paper_id] = 0
-        self._save()
+        self._rerank(paper_id, old)
+        self._commit({"op": "access", "id": paper_id, "count": 0})
 
+    @_synced(exclusive=False)
+    @_cached(popular=lambda params: params["order"] == "popular")
     def get_ranking(self, order="popular", limit=None, filter_keyword=None):
-        papers = self._data.copy()
+        # limit指定の人気順は全件を並べ替えず、ヒープで上位limit件だけを選ぶ
+        # ranking_index=Trueで絞り込みが無ければ、保持している順位表の先頭を返す
+        papers = self._data
         if filter_keyword:
             norm_kw = self._normalize(filter_keyword)
-            papers = [p for p in papers if norm_kw in self._normalize(p.get("title", ""))]
+            ids = self._text_index.candidates(norm_kw) if isinstance(norm_kw, str) else None
+            if ids is not None:
+                papers = [self._data[i] for i in sorted(self._index[d] for d in ids)]
+            papers = [p for p in papers if norm_kw in self._shadow_of(p).title]
+        elif order == "popular" and self.ranking_index:
+            ranked = self._ranked()
+            return [self._data[self._index[pid]] for _, pid in (ranked[:limit] if limit else ranked)]
         if order == "popular":
-            papers.sort(key=lambda p: (-self._access.get(p["id"], 0), p["id"]))
+            key = lambda p: (-self._access_count(p["id"]), p["id"])
+            if limit and limit > 0:
+                return heapq.nsmallest(limit, papers, key=key)
+            papers = sorted(papers, key=key)
         elif order == "newest":
-            papers = list(reversed(papers))
-        if limit:
-            papers = papers[:limit]
-        return papers
+            if limit and limit > 0:
+                return papers[:-limit - 1:-1]
+            papers = papers[::-1]
+        return papers[:limit] if limit else list(papers)
 
-    def fulltext_search(self, keyword, exact=False, regex=False, mode="OR", order_by_score=False, highlight=False, limit=None, offset=0, return_count=False, **kwargs):
+    @_synced(exclusive=False)
+    @_cached(owned=True)
+    def fulltext_search(self, keyword, exact=False, regex=False, mode="OR", order_by_score=False, highlight=False, limit=None, offset=0, return_count=False, snippets=None, snippet_width=160, **kwargs):
         # 正規表現・normalize対応・order_by_score対応
-        import re
-        def _normalize(s):
-            import unicodedata
-            if not isinstance(s, str):
-                return ""
-            s = unicodedata.normalize('NFKC', s)
-            s = s.lower().replace(" ", "")
-            return s
-        if isinstance(keyword, list):
-            keywords = [_normalize(k) for k in keyword]
-            raw_keywords = keyword
-        else:
-            keywords = [_normalize(keyword)]
-            raw_keywords = [keyword]
-        def match(p):
-            def join_authors(auths):
-                if isinstance(auths, list):
-                    # flatten and stringify
-                    flat = []
-                    for a in auths:
-                        if isinstance(a, list):
-                            flat.extend([str(x) for x in a])
-                        else:
-                            flat.append(str(a))
-                    return " ".join(flat)
-                return str(auths)
-            targets = [
-                _normalize(p.get("title", "")),
-                _normalize(join_authors(p.get("authors", []))),
-                _normalize(p.get("summary", ""))
-            ]
-            raw_targets = [
-                p.get("title", ""),
-                join_authors(p.get("authors", [])),
-                p.get("summary", "")
-            ]
-            for i, kw in enumerate(keywords):
-                raw_kw = raw_keywords[i] if i < len(raw_keywords) else kw
-                if regex:
-                    found = any(re.search(raw_kw, t, re.IGNORECASE) for t in raw_targets)
-                elif exact:
-                    found = any(kw == t for t in targets)
-                else:
-                    found = any(_normalize(kw) in t for t in [
-                        _normalize(p.get("title", "")),
-                        _normalize(join_authors(p.get("authors", []))),
-                        _normalize(p.get("summary", ""))
-                    ])
-                if mode == "AND" and not found:
-                    return False
-                if mode == "OR" and found:
-                    return True
-            return mode == "AND"
-        def score(p):
-            # 完全一致優先、部分一致数（同数ならタイトル長が短い方）
-            fields = [_normalize(p.get("title", "")), _normalize(" ".join(p.get("authors", []))), _normalize(p.get("summary", ""))]
-            exact_matches = sum(any(kw == f for f in fields) for kw in keywords)
-            partial_matches = sum(any(kw in f for f in fields) for kw in keywords)
-            title_len = len(p.get("title", ""))
-            return (-exact_matches, -partial_matches, title_len)
-        results = [dict(p) for p in self._data if match(p)]
-        if order_by_score:
-            results.sort(key=score)
-        # ハイライト（title, summary, authorsリスト含む全対応）
-        def highlight_text(text, kws, regex_mode):
-            import re
-            import unicodedata
-            if not isinstance(text, str) or not text or not kws:
-                return text
-            # 元テキスト→normalize後のインデックス対応表を構築
-            norm_chars = []
-            norm_to_orig = []
-            for i, c in enumerate(text):
-                nc = unicodedata.normalize('NFKC', c).lower().replace(' ', '')
-                for j in range(len(nc)):
-                    norm_chars.append(nc[j])
-                    norm_to_orig.append(i)
-            norm_text = ''.join(norm_chars)
-            mark_ranges = [False] * len(text)
-            for kw in kws:
-                norm_kw = unicodedata.normalize('NFKC', str(kw)).lower().replace(' ', '')
-                if not norm_kw:
-                    continue
-                if regex_mode:
-                    try:
-                        for m in re.finditer(norm_kw, norm_text, flags=re.IGNORECASE):
-                            s, e = m.start(), m.end()
-                            orig_idx = set(norm_to_orig[s:e])
-                            for i in orig_idx:
-                                if 0 <= i < len(mark_ranges):
-                                    mark_ranges[i] = True
-                    except Exception:
-                        continue
+        query = compile_query(keyword, regex)
+        positions = self._candidate_positions(query.terms, mode, regex)
+        papers = self._data if positions is None else [self._data[i] for i in positions]
+        return search_papers(
+            papers, self._shadow_of, query.keywords, query.raw_keywords, exact=exact, regex=regex, mode=mode,
+            order_by_score=order_by_score, highlight=highlight, limit=limit, offset=offset,
+            return_count=return_count, snippets=snippets, snippet_width=snippet_width, patterns=query.patterns,
+            score=self._scorer(query, exact, regex) if order_by_score else None,
+        )
+
+    @_synced(exclusive=False)
+    def fulltext_search_page(self, keyword, page_size=20, cursor=None, with_total=False, exact=False, regex=False,
+                             mode="OR", order_by_score=False, highlight=False, snippets=None, snippet_width=160):
+        # カーソル方式のページング。1ページ分だけ照合・コピー・ハイライトし、続きを取るカーソルを返す
+        # 戻り値は {"results": 論文, "cursor": 次ページのカーソル（最後のページならNone）, "total": 一致件数}
+        # totalはwith_total=Trueのときだけ数える（それ以外はNone）
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise ValueError("page_size must be a positive integer.")
+        query = compile_query(keyword, regex)
+        keywords, raw_keywords, patterns = query.keywords, query.raw_keywords, query.patterns
+        fingerprint = query_fingerprint(keyword, exact, regex, mode, order_by_score)
+        start, last_id = decode_cursor(cursor, fingerprint) if cursor is not None else (0, None)
+        with regex_time_limit(regex):
+            positions = self._candidate_positions(query.terms, mode, regex)
+            total = None
+            next_cursor = None
+            if order_by_score:
+                # 並べ替えには全件の照合が要るので、件数もそのまま得られる（並べるのは上位start+page_size件だけ）
+                papers = self._data if positions is None else [self._data[i] for i in positions]
+                matches = list(iter_matches(
+                    papers, self._shadow_of, keywords, raw_keywords, exact, regex, mode, patterns,
+                ))
+                ranked = rank_by_score(matches, self._scorer(query, exact, regex), start + page_size)
+                page = [p for p, _ in ranked[start:]]
+                if start + page_size < len(matches):
+                    next_cursor = encode_cursor(fingerprint, start + page_size)
+                total = len(matches)
+            else:
+                # 直前に返した論文の次から再開する（間に削除があって位置がずれていても続きから）
+                if last_id is not None and last_id in self._index:
+                    start = self._index[last_id] + 1
+                if positions is None:
+                    order = range(start, len(self._data))
                 else:
-                    idx = 0
-                    while idx < len(norm_text):
-                        found = norm_text.find(norm_kw, idx)
-                        if found == -1:
-                            break
-                        orig_idx = set(norm_to_orig[found:found+len(norm_kw)])
-                        for i in orig_idx:
-                            if 0 <= i < len(mark_ranges):
-                                mark_ranges[i] = True
-                        idx = found + len(norm_kw)
-            # 実際のテキストに対応するインデックスで<mark>を挿入
-            out = ""
-            in_mark = False
-            for i, c in enumerate(text):
-                if i < len(mark_ranges) and mark_ranges[i] and not in_mark:
-                    out += "<mark>"
-                    in_mark = True
-                if i < len(mark_ranges) and not mark_ranges[i] and in_mark:
-                    out += "</mark>"
-                    in_mark = False
-                out += c
-            if in_mark:
-                out += "</mark>"
-            return out
-        def highlight_field(val, kws, regex_mode):
-            if isinstance(val, list):
-                return [highlight_field(v, kws, regex_mode) for v in val]
-            return highlight_text(val, kws, regex_mode)
-        if highlight and results and keywords:
-            for p in results:
-                for k in ["title", "summary", "authors"]:
-                    if k in p and p[k] is not None:
-                        p[k] = highlight_field(p[k], raw_keywords, regex)
-        # ページネーション: 型・値チェック
-        _offset = offset if isinstance(offset, int) and offset >= 0 else 0
-        _limit = limit if (isinstance(limit, int) and limit >= 0) else None
-        if _offset:
-            results = results[_offset:]
-        if _limit is not None:
-            results = results[:_limit]
-        if return_count:
-            return results, len(results)
-        return results
+                    order = positions[bisect_left(positions, start):]
+                page = []
+                last_pos = None
+                papers = (self._data[pos] for pos in order)
+                matches = iter_matches(papers, self._shadow_of, keywords, raw_keywords, exact, regex, mode, patterns)
+                for p, _ in matches:
+                    if len(page) == page_size:
+                        # 次の一致が見つかった時点で続きがあると分かる
+                        next_cursor = encode_cursor(fingerprint, last_pos + 1, page[-1].get("id"))
+                        break
+                    page.append(p)
+                    last_pos = self._index[p["id"]]
+                if with_total:
+                    total = self._count_matches(positions, query, exact, regex, mode)
+            results = decorate_results(
+                [dict(p) for p in page], keywords, raw_keywords, regex, highlight, snippets, snippet_width,
+            )
+        return {"results": results, "cursor": next_cursor, "total": total}
+
+    def _candidate_positions(self, terms, mode, regex=False):
+        # fulltext_searchの候補の位置（昇順）。n-gramインデックスで絞り込めなければNone
+        # termsはcompile_queryの絞り込み用の語（正規表現では必ず含まれるリテラル部分）
+        if mode not in ("AND", "OR"):
+            return None
+        ids = self._search_candidates(terms, mode)
+        if ids is None:
+            return None
+        if regex:
+            ids = ids | self._regex_unsafe
+        return sorted(self._index[d] for d in ids)
+
+    def _scorer(self, query, exact, regex):
+        # BM25の統計はインデックスから取る（文書頻度は語を含む論文の数で、変更があるまでキャッシュする）
+        index = self._text_index
+        return bm25_scorer(
+            query.keywords, index.doc_count, index.average_lengths(),
+            [self._document_frequency(term) for term in query.terms], exact, query.patterns if regex else None,
+        )
+
+    def _document_frequency(self, term):
+        df = self._df_cache.get(term)
+        if df is None:
+            ids = self._text_index.candidates(term)
+            if ids is not None and len(term) == self._text_index.n:
+                df = len(ids)
+            else:
+                shadows = self._shadow.values() if ids is None else (self._shadow[d] for d in ids)
+                df = sum(1 for sh in shadows if term in sh.title or term in sh.authors or term in sh.summary)
+            self._df_cache[term] = df
+        return df
+
+    def _count_matches(self, positions, query, exact, regex, mode):
+        # 全ての語がちょうどn文字の部分一致なら、転置リストから得た候補がそのまま一致の集合になる
+        n = self._text_index.n
+        keywords = query.keywords
+        if positions is not None and not (exact or regex) and keywords and all(len(kw) == n for kw in keywords):
+            return len(positions)
+        papers = self._data if positions is None else [self._data[i] for i in positions]
+        return sum(1 for _ in iter_matches(
+            papers, self._shadow_of, keywords, query.raw_keywords, exact, regex, mode, query.patterns,
+        ))
+
+    @_synced(exclusive=True)
     def add(self, paper):
-        idx = next((i for i, p in enumerate(self._data) if p["id"] == paper["id"]), None)
-        if idx is not None:
-            self._data[idx] = paper
-        else:
-            self._data.append(paper)
-        self._save()
+        rec = {"op": "add", "paper": paper}
+        self._apply(rec)
+        self._commit(rec)
+    @_synced(exclusive=True)
+    def add_many(self, papers, on_conflict="replace"):
+        # まとめて反映し、保存（ジャーナルなら1レコード）は1回だけ行う
+        if on_conflict not in ("replace", "skip"):
+            raise ValueError("on_conflict must be 'replace' or 'skip'.")
+        # 途中で失敗して一部だけ反映されないよう、先に全件を検証する
+        papers = list(papers)
+        if not all(isinstance(p, dict) and "id" in p for p in papers):
+            raise ValueError("Each paper must be a dict with an 'id'.")
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        applied = []
+        for paper in papers:
+            if paper["id"] in self._index:
+                if on_conflict == "skip":
+                    counts["skipped"] += 1
+                    continue
+                counts["updated"] += 1
+            else:
+                counts["inserted"] += 1
+            self._apply({"op": "add", "paper": paper})
+            applied.append(paper)
+        if applied:
+            self._commit({"op": "add_many", "papers": applied})
+        return counts
+    @_synced(exclusive=False)
     def get_all(self):
         return list(self._data)
+    @_synced(exclusive=False)
     def get_by_id(self, paper_id):
-        for p in self._data:
-            if p["id"] == paper_id:
-                return p
-        return None
+        idx = self._index.get(paper_id)
+        if idx is None:
+            return None
+        return self._data[idx]
+    @_synced(exclusive=False)
+    @_cached(normalize={"keyword": lambda kw: normalize_text(kw) if isinstance(kw, str) else kw})
     def search(self, keyword):
         norm_kw = self._normalize(keyword)
         result = []
         for p in self._data:
+            sh = self._shadow_of(p)
             if (
-                norm_kw in self._normalize(p.get("title", "")) or
-                norm_kw in self._normalize(",".join(p.get("authors", []))) or
-                norm_kw in self._normalize(p.get("summary", ""))
+                norm_kw in sh.title or
+                norm_kw in sh.authors_csv or
+                norm_kw in sh.summary
             ):
                 result.append(p)
         return result
+    @_synced(exclusive=True)
     def update(self, paper_id, new_paper):
-        for i, p in enumerate(self._data):
-            if p["id"] == paper_id:
-                self._data[i] = new_paper
-                self._save()
-                return
-        raise Exception("Paper not found for update.")
+        if paper_id not in self._index:
+            raise Exception("Paper not found for update.")
+        # 別の論文が使っているIDへの変更は、その論文のインデックスを上書きしてしまうので拒否する
+        new_id = new_paper.get("id")
+        if new_id != paper_id and new_id in self._index:
+            raise Exception("Paper id already exists.")
+        rec = {"op": "update", "id": paper_id, "paper": new_paper}
+        self._apply(rec)
+        self._commit(rec)
+    @_synced(exclusive=True)
     def delete(self, paper_id):
-        idx = next((i for i, p in enumerate(self._data) if p["id"] == paper_id), None)
-        if idx is None:
+        if paper_id not in self._index:
             raise Exception("Paper not found for delete.")
-        self._data.pop(idx)
-        self._save()
+        rec = {"op": "delete", "id": paper_id}
+        self._apply(rec)
+        self._commit(rec)
 
     def _normalize(self, s):
         if not isinstance(s, str):
@@ -242,44 +849,108 @@ class Storage:
         s = s.lower().replace(' ', '')
         return s
 
+    def _dedup_keys(self, paper):
+        # is_duplicateで使う (ID, 正規化タイトル, 著者リスト指紋)。判定に使わない項目はNone
+        pid = paper.get("id") or None
+        title = paper.get("title")
+        title_key = normalize_text(title) if title and isinstance(title, str) else None
+        authors = paper.get("authors")
+        return pid, title_key, (authors_key(authors) if authors else None)
+
+    @_synced(exclusive=False)
     def is_duplicate(self, paper):
+        pid, title_key, auth_key = self._dedup_keys(paper)
         # ID完全一致
-        pid = paper.get("id")
-        if pid and any(p.get("id") == pid for p in self._data):
+        if pid is not None and pid in self._index:
             return True
         # タイトル完全一致
-        title = paper.get("title")
-        if title and any(self._normalize(p.get("title")) == self._normalize(title) for p in self._data):
+        if title_key is not None and title_key in self._title_counts:
             return True
         # 著者完全一致
-        authors = paper.get("authors")
-        if authors and any(p.get("authors") == authors for p in self._data):
+        if auth_key is not None and auth_key in self._authors_counts:
             return True
         return False
 
-    def find_duplicates(self, paper):
+    @_synced(exclusive=False)
+    def filter_new(self, papers):
+        # 既存論文とも、同じバッチ内の先行論文とも重複しないものだけを返す
+        seen_ids, seen_titles, seen_authors = set(), set(), set()
+        result = []
+        for paper in papers:
+            if self.is_duplicate(paper):
+                continue
+            pid, title_key, auth_key = self._dedup_keys(paper)
+            if (pid is not None and pid in seen_ids) or \
+                    (title_key is not None and title_key in seen_titles) or \
+                    (auth_key is not None and auth_key in seen_authors):
+                continue
+            for seen, key in ((seen_ids, pid), (seen_titles, title_key), (seen_authors, auth_key)):
+                if key is not None:
+                    seen.add(key)
+            result.append(paper)
+        return result
+
+    def _summary_lsh(self):
+        # summary類似候補用のLSHは初回利用時に構築し、以降は変更に追従させる
+        if self._lsh is None:
+            self._lsh = MinHashLSH()
+            for pid, sh in self._shadow.items():
+                self._lsh.add(pid, sh.summary)
+        return self._lsh
+
+    def _duplicate_candidates(self, paper, norm_title, norm_authors, norm_summary):
+        # 各条件の候補IDの和集合。絞り込めない条件があればNone（全件走査）
+        ids = set()
+        pid = paper.get("id")
+        if pid and pid in self._index:
+            ids.add(pid)
+        terms = ([norm_title] if norm_title else []) + (norm_authors if norm_authors else [])
+        for term in terms:
+            if not isinstance(term, str) or "," in term:
+                return None
+            cands = self._text_index.candidates(term)
+            if cands is None:
+                return None
+            ids |= cands
+        if norm_summary:
+            if not isinstance(norm_summary, str):
+                return None
+            ids |= self._summary_lsh().query(norm_summary)
+        return ids
+
+    @_synced(exclusive=False)
+    def find_duplicates(self, paper, summary_threshold=0.8):
         result = []
         norm_title = self._normalize(paper.get("title", ""))
         norm_authors = [self._normalize(a) for a in paper.get("authors", [])]
         norm_summary = self._normalize(paper.get("summary", ""))
-        for p in self._data:
+        papers = self._data
+        ids = self._duplicate_candidates(paper, norm_title, norm_authors, norm_summary)
+        if ids is not None:
+            papers = [self._data[i] for i in sorted(self._index[d] for d in ids if d in self._index)]
+        for p in papers:
+            sh = self._shadow_of(p)
             # ID完全一致
             if paper.get("id") and p.get("id") == paper.get("id"):
                 result.append(p)
                 continue
             # タイトル部分一致
-            if norm_title and norm_title in self._normalize(p.get("title", "")):
+            if norm_title and norm_title in sh.title:
                 result.append(p)
                 continue
             # 著者部分一致
-            if norm_authors and any(a in self._normalize(",".join(p.get("authors", []))) for a in norm_authors):
+            if norm_authors and any(a in sh.authors_csv for a in norm_authors):
                 result.append(p)
                 continue
-            # summary類似度（difflibで0.8以上）
+            # summary類似度（difflibでsummary_threshold以上、既定0.8）
             if norm_summary:
                 import difflib
-                candidate = self._normalize(p.get("summary", ""))
-                if difflib.SequenceMatcher(None, norm_summary, candidate).ratio() >= 0.8:
+                candidate = sh.summary
+                if difflib.SequenceMatcher(None, norm_summary, candidate).ratio() >= summary_threshold:
                     result.append(p)
                     continue
         return result
+
+    @_synced(exclusive=False)
+    def find_duplicates_many(self, papers, summary_threshold=0.8):
+        return [self.find_duplicates(p, summary_threshold=summary_threshold) for p in papers]
@@ -0,0 +1,134 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import storage
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:9101.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/9101.00001.pdf"
+}
+
+def _store(tmp_path, **kwargs):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, **kwargs)
+    for i in range(3):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; store.add(p)
+    return store, json_path
+
+def _persisted_access(json_path):
+    if not os.path.exists(json_path + ".access.json"):
+        return {}
+    with open(json_path + ".access.json") as f:
+        return json.load(f)
+
+# 1. アクセス数の記録で論文JSONは書き直さない
+def test_record_access_skips_papers_file(tmp_path):
+    store, json_path = _store(tmp_path)
+    before = os.stat(json_path).st_mtime_ns, os.stat(json_path).st_ino
+    store.record_access("arxiv:1")
+    assert (os.stat(json_path).st_mtime_ns, os.stat(json_path).st_ino) == before
+    assert _persisted_access(json_path) == {"arxiv:1": 1}
+
+# 2. バッファ中の増分も件数・ランキングに反映される
+def test_buffered_counts_visible_before_flush(tmp_path):
+    store, json_path = _store(tmp_path, buffer_access=True, flush_interval=3600)
+    store.record_access("arxiv:2")
+    store.record_access("arxiv:2")
+    store.record_access("arxiv:1")
+    assert _persisted_access(json_path) == {}
+    assert store.get_access_count("arxiv:2") == 2
+    assert [p["id"] for p in store.get_ranking()] == ["arxiv:2", "arxiv:1", "arxiv:0"]
+
+# 3. 件数のしきい値に達すると1回で書き出す
+def test_flush_on_count_threshold(tmp_path):
+    store, json_path = _store(tmp_path, buffer_access=True, flush_every=3, flush_interval=3600)
+    store.record_access("arxiv:0")
+    store.record_access("arxiv:1")
+    assert _persisted_access(json_path) == {}
+    store.record_access("arxiv:0")
+    assert _persisted_access(json_path) == {"arxiv:0": 2, "arxiv:1": 1}
+    assert store.get_access_count("arxiv:0") == 2
+
+# 4. 時間のしきい値を過ぎていれば次の記録で書き出す
+def test_flush_on_time_threshold(tmp_path, monkeypatch):
+    store, json_path = _store(tmp_path, buffer_access=True, flush_every=1000, flush_interval=5.0)
+    now = [storage.time.monotonic()]
+    monkeypatch.setattr(storage.time, "monotonic", lambda: now[0])
+    store.record_access("arxiv:0")
+    assert _persisted_access(json_path) == {}
+    now[0] += 6
+    store.record_access("arxiv:0")
+    assert _persisted_access(json_path) == {"arxiv:0": 2}
+
+# 5. flush()・close()・終了時フックで書き出され、再オープン後も残る
+def test_explicit_flush_close_and_atexit(tmp_path):
+    store, json_path = _store(tmp_path, buffer_access=True, flush_interval=3600)
+    store.record_access("arxiv:0")
+    store.flush()
+    assert _persisted_access(json_path) == {"arxiv:0": 1}
+    store.record_access("arxiv:0")
+    store.close()
+    assert Storage(json_path).get_access_count("arxiv:0") == 2
+    store.record_access("arxiv:1")
+    storage._flush_buffered_stores()
+    assert Storage(json_path).get_access_count("arxiv:1") == 1
+
+# 6. ジャーナルモードでは1回のflushが1行になる
+def test_buffered_journal_one_record_per_flush(tmp_path):
+    store, json_path = _store(tmp_path, journal=True, buffer_access=True, flush_interval=3600)
+    for _ in range(5):
+        store.record_access("arxiv:0")
+    store.record_access("arxiv:1")
+    store.flush()
+    with open(json_path + ".journal") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[-1] == {"op": "access_many", "counts": {"arxiv:0": 5, "arxiv:1": 1}}
+    assert len(lines) == 4
+    store.close()
+    assert Storage(json_path, journal=True).get_access_count("arxiv:0") == 5
+
+# 7. reset_accessはバッファ中の増分も捨てる
+def test_reset_discards_pending(tmp_path):
+    store, json_path = _store(tmp_path, buffer_access=True, flush_interval=3600)
+    store.record_access("arxiv:0")
+    store.reset_access("arxiv:0")
+    store.flush()
+    assert store.get_access_count("arxiv:0") == 0
+    assert _persisted_access(json_path) == {"arxiv:0": 0}
+
+# 8. shared=Trueでは他プロセスの書き出しに自分の増分を足して書き出す
+def test_buffered_shared_merges(tmp_path):
+    store, json_path = _store(tmp_path, shared=True, buffer_access=True, flush_interval=3600)
+    other = Storage(json_path, shared=True, buffer_access=True, flush_interval=3600)
+    store.record_access("arxiv:0")
+    other.record_access("arxiv:0")
+    other.flush()
+    assert store.get_access_count("arxiv:0") == 2
+    store.flush()
+    assert Storage(json_path).get_access_count("arxiv:0") == 2
+
+# 9. 複数スレッドからの記録と書き出しが並行しても増分が失われない
+def test_buffered_threads_keep_all_counts(tmp_path):
+    import threading
+    store, json_path = _store(tmp_path, buffer_access=True, flush_every=50, flush_interval=3600, fsync="never")
+    errors = []
+    def worker(i):
+        try:
+            for _ in range(2000):
+                store.record_access(f"arxiv:{i % 3}")
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.flush()
+    assert errors == []
+    assert sum(store.get_access_count(f"arxiv:{i}") for i in range(3)) == 16000
+    assert sum(_persisted_access(json_path).values()) == 16000
@@ -40,7 +40,7 @@ import requests
 from unittest.mock import patch
 
 def test_search_network_error():
-    with patch("arxiv_client.requests.get", side_effect=requests.ConnectionError):
+    with patch("arxiv_client.requests.Session.get", side_effect=requests.ConnectionError):
         with pytest.raises(ConnectionError):
             search_arxiv("prompt engineering")
 
@@ -51,7 +51,7 @@ def test_search_invalid_response():
     mock_resp = Mock()
     mock_resp.status_code = 200
     mock_resp.text = "not xml"
-    with patch("arxiv_client.requests.get", return_value=mock_resp):
+    with patch("arxiv_client.requests.Session.get", return_value=mock_resp):
         with pytest.raises(ValueError):
             search_arxiv("prompt engineering")
 
@@ -95,7 +95,7 @@ def test_search_rate_limit():
     mock_resp = Mock()
     mock_resp.status_code = 429
     mock_resp.text = ""
-    with patch("arxiv_client.requests.get", return_value=mock_resp):
+    with patch("arxiv_client.requests.Session.get", return_value=mock_resp):
         with pytest.raises(Exception):
             search_arxiv("prompt engineering")
 
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+from unittest.mock import patch, Mock
+from arxiv_client import iter_arxiv
+
+def _entry(i):
+    return f"""<entry>
+<id>http://arxiv.org/abs/2401.{i:05d}v1</id>
+<title>Paper {i}</title>
+<summary>Summary {i}</summary>
+<author><name>Author {i}</name></author>
+<link title="pdf" href="http://arxiv.org/pdf/2401.{i:05d}v1" rel="related" type="application/pdf"/>
+</entry>"""
+
+def _feed(ids):
+    body = "".join(_entry(i) for i in ids)
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">{body}</feed>'
+
+def _fake_get(total):
+    calls = []
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        calls.append(dict(params))
+        start, size = params["start"], params["max_results"]
+        resp = Mock()
+        resp.status_code = 200
+        body = _feed(range(start, min(start + size, total))).encode()
+        resp.iter_content = lambda chunk_size: [body[i:i + 100] for i in range(0, len(body), 100)]
+        return resp
+    return fake_get, calls
+
+# 1. startをずらしながら全ページを順に取得する
+def test_iter_arxiv_pages():
+    fake_get, calls = _fake_get(25)
+    with patch("arxiv_client.requests.Session.get", side_effect=fake_get):
+        papers = list(iter_arxiv("prompt", page_size=10, delay=0))
+    assert [p["title"] for p in papers] == [f"Paper {i}" for i in range(25)]
+    assert [c["start"] for c in calls] == [0, 10, 20]
+
+# 2. max_resultsで取得件数と最終ページのサイズを制限できる
+def test_iter_arxiv_max_results():
+    fake_get, calls = _fake_get(100)
+    with patch("arxiv_client.requests.Session.get", side_effect=fake_get):
+        papers = list(iter_arxiv("prompt", max_results=15, page_size=10, delay=0))
+    assert len(papers) == 15
+    assert [c["max_results"] for c in calls] == [10, 5]
+
+# 3. ページ間で推奨間隔だけ待機する（最初のリクエスト前は待たない）
+def test_iter_arxiv_delay():
+    fake_get, calls = _fake_get(25)
+    with patch("arxiv_client.requests.Session.get", side_effect=fake_get), \
+            patch("arxiv_client.time.sleep") as sleep:
+        list(iter_arxiv("prompt", page_size=10, delay=3.0))
+    assert [c.args[0] for c in sleep.call_args_list] == [3.0, 3.0]
+
+# 4. ジェネレータなので最初のページ分だけで止められる
+def test_iter_arxiv_lazy():
+    fake_get, calls = _fake_get(1000)
+    with patch("arxiv_client.requests.Session.get", side_effect=fake_get):
+        it = iter_arxiv("prompt", page_size=10, delay=0)
+        first = next(it)
+    assert first["title"] == "Paper 0"
+    assert len(calls) == 1
+
+# 5. 空クエリ・不正なpage_sizeは例外
+def test_iter_arxiv_invalid_args():
+    with pytest.raises(ValueError):
+        next(iter_arxiv(""))
+    with pytest.raises(ValueError):
+        next(iter_arxiv("prompt", page_size=0))
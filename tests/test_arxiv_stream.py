@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+import requests
+from unittest.mock import patch, Mock
+from arxiv_client import search_arxiv, _iter_entries
+
+HEADER = b'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>q</title>'
+FOOTER = b'</feed>'
+
+def _entry(i):
+    return (f'<entry><id>http://arxiv.org/abs/2402.{i:05d}v1</id><title>Paper {i}</title>'
+            f'<summary>Summary {i}</summary><author><name>Author {i}</name></author></entry>').encode()
+
+# 1. 本文の受信完了前に最初の論文が返る
+def test_stream_first_result_before_body_end():
+    consumed = []
+    def chunks():
+        for part in [HEADER, _entry(0), _entry(1), FOOTER]:
+            consumed.append(part)
+            yield part
+    it = _iter_entries(chunks())
+    first = next(it)
+    assert first["title"] == "Paper 0"
+    assert FOOTER not in consumed
+    assert [p["title"] for p in it] == ["Paper 1"]
+
+# 2. チャンク境界がタグの途中でも正しくパースできる
+def test_stream_split_chunks():
+    body = HEADER + b"".join(_entry(i) for i in range(5)) + FOOTER
+    papers = list(_iter_entries(body[i:i + 7] for i in range(0, len(body), 7)))
+    assert [p["id"] for p in papers] == [f"http://arxiv.org/abs/2402.{i:05d}v1" for i in range(5)]
+    assert papers[0]["pdf_url"] == "http://arxiv.org/pdf/2402.00000v1.pdf"
+
+# 3. 処理済みentryはツリーから取り除かれる
+def test_stream_releases_entries():
+    roots = []
+    def chunks():
+        yield HEADER
+        for i in range(50):
+            yield _entry(i)
+        yield FOOTER
+    import xml.etree.ElementTree as ET
+    original = ET.XMLPullParser
+    class SpyParser(original):
+        def read_events(self):
+            for event, elem in super().read_events():
+                if event == "start" and not roots:
+                    roots.append(elem)
+                yield event, elem
+    with patch("arxiv_client.ET.XMLPullParser", SpyParser):
+        assert len(list(_iter_entries(chunks()))) == 50
+    assert not roots[0].findall("{http://www.w3.org/2005/Atom}entry")
+
+# 4. 途中で壊れたXMLは例外
+def test_stream_broken_xml():
+    with pytest.raises(ValueError):
+        list(_iter_entries([HEADER, _entry(0), b"<entry><title>broken</summary>"]))
+
+# 5. 受信途中の通信エラーはConnectionError
+def test_stream_network_error_midway():
+    def chunks():
+        yield HEADER
+        yield _entry(0)
+        raise requests.exceptions.ChunkedEncodingError()
+    with pytest.raises(ConnectionError):
+        list(_iter_entries(chunks()))
+
+# 6. search_arxivはストリーミング応答から論文リストを返す
+def test_search_arxiv_streaming_response():
+    body = HEADER + _entry(0) + _entry(1) + FOOTER
+    mock_resp = Mock()
+    mock_resp.status_code = 200
+    mock_resp.iter_content = lambda chunk_size: [body]
+    with patch("arxiv_client.requests.Session.get", return_value=mock_resp) as get:
+        results = search_arxiv("prompt engineering", max_results=2)
+    assert [p["title"] for p in results] == ["Paper 0", "Paper 1"]
+    assert get.call_args.kwargs["stream"] is True
+    mock_resp.close.assert_called_once()
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import random
+import pytest
+from storage import Storage
+from sqlite_storage import SQLiteStorage
+
+WORDS = ["prompt", "agent", "retrieval", "generation", "model", "tuning", "検索", "拡張"]
+
+def _paper(i, title, summary="", authors=None):
+    return {"id": f"arxiv:{i}", "title": title, "authors": authors or [f"Author {i}"], "summary": summary}
+
+def _ids(results):
+    return [p["id"] for p in results]
+
+# 1. フィールドの重みは title > authors > summary
+def test_field_weights(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(_paper(0, "Other", "about agent systems"))
+    store.add(_paper(1, "Other", "about systems", authors=["Agent Smith"]))
+    store.add(_paper(2, "Agent systems", "about systems"))
+    assert _ids(store.fulltext_search("agent", order_by_score=True)) == ["arxiv:2", "arxiv:1", "arxiv:0"]
+
+# 2. 同じ出現数なら短いフィールドが上位
+def test_length_normalization(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(_paper(0, "AI Agent Prompt"))
+    store.add(_paper(1, "AI Agent"))
+    assert _ids(store.fulltext_search("Agent", order_by_score=True)) == ["arxiv:1", "arxiv:0"]
+
+# 3. 複数語では珍しい語の一致の方が重い
+def test_rare_terms_weigh_more(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    for i in range(10):
+        store.add(_paper(i, f"model number {i}"))
+    store.add(_paper(10, "distillation study"))
+    result = store.fulltext_search(["model", "distillation"], order_by_score=True, limit=1)
+    assert _ids(result) == ["arxiv:10"]
+
+# 4. 上位k件の選択は全件の並べ替えの先頭と一致し、統計は追加・削除に追従する
+def test_topk_and_stats_follow_changes(tmp_path):
+    rng = random.Random(2)
+    store = Storage(str(tmp_path / "papers.json"))
+    for i in range(200):
+        store.add(_paper(i, " ".join(rng.sample(WORDS, 3)), " ".join(rng.choices(WORDS, k=rng.randint(1, 8)))))
+    full = store.fulltext_search(["agent", "検索"], order_by_score=True)
+    for offset, limit in ((0, 5), (7, 10), (190, 20)):
+        assert store.fulltext_search(["agent", "検索"], order_by_score=True, limit=limit, offset=offset) == full[offset:offset + limit]
+    assert store._text_index.doc_count == 200
+    for i in range(100):
+        store.delete(f"arxiv:{i}")
+    assert store._text_index.doc_count == 100
+    fresh = Storage(str(tmp_path / "papers.json"))
+    assert store._text_index.average_lengths() == pytest.approx(fresh._text_index.average_lengths())
+    assert store.fulltext_search("agent", order_by_score=True) == fresh.fulltext_search("agent", order_by_score=True)
+
+# 5. SQLiteStorageでも同じ順位になる
+@pytest.mark.parametrize("keyword,kwargs", [
+    (["agent", "tuning"], {}),
+    ("prompt", {"mode": "AND"}),
+    (r"retriev\w+", {"regex": True}),
+    ("model", {"limit": 3, "offset": 2}),
+])
+def test_sqlite_same_ranking(tmp_path, keyword, kwargs):
+    rng = random.Random(3)
+    store = Storage(str(tmp_path / "papers.json"))
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    papers = [_paper(i, " ".join(rng.sample(WORDS, 3)), " ".join(rng.choices(WORDS, k=rng.randint(1, 8))))
+              for i in range(60)]
+    store.add_many(papers)
+    db.add_many(papers)
+    expected = store.fulltext_search(keyword, order_by_score=True, **kwargs)
+    assert expected
+    assert db.fulltext_search(keyword, order_by_score=True, **kwargs) == expected
+    page = db.fulltext_search_page(keyword, page_size=4, order_by_score=True, mode=kwargs.get("mode", "OR"),
+                                   regex=kwargs.get("regex", False))
+    assert page["results"] == store.fulltext_search_page(keyword, page_size=4, order_by_score=True,
+                                                         mode=kwargs.get("mode", "OR"),
+                                                         regex=kwargs.get("regex", False))["results"]
@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import re
+import time
+import random
+import signal
+import pytest
+import fulltext_index
+from fulltext_index import compile_query
+from storage import Storage
+from sqlite_storage import SQLiteStorage
+
+WORDS = ["prompt", "agent", "retrieval", "generation", "model", "Tuning", "検索", "拡張", "ＡＩ"]
+
+def _stores(tmp_path):
+    rng = random.Random(1)
+    store = Storage(str(tmp_path / "papers.json"))
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    papers = []
+    for i in range(120):
+        papers.append({
+            "id": f"arxiv:{i}",
+            "title": " ".join(rng.sample(WORDS, 3)),
+            "authors": [f"Author {i % 7}"],
+            "summary": " ".join(rng.sample(WORDS, 4)) + f" v{i}",
+        })
+    store.add_many(papers)
+    db.add_many(papers)
+    return store, db
+
+# 1. 同じ検索条件はキャッシュされ、リストの検索語でも使い回される
+def test_compile_query_cached():
+    assert compile_query(["a.c", "b+"], True) is compile_query(["a.c", "b+"], True)
+    assert compile_query("prompt") is compile_query("prompt")
+    q = compile_query("ＡＩ Agents")
+    assert q.keywords == ["aiagents"] and q.patterns is None and q.terms == ["aiagents"]
+
+# 2. 正規表現から必ず含まれるリテラルを取り出す（無ければ空）
+@pytest.mark.parametrize("pattern,literal", [
+    (r"retrieval\s+aug", "retrieval"),
+    (r"prom+pt", "prom"),
+    (r"v1\d", "v1"),
+    (r"(foo|bar)baz", "baz"),
+    (r"foo|barbaz", ""),
+    (r"x?y", "y"),
+    (r"Ret.*Gen", "ret"),
+])
+def test_required_literal(pattern, literal):
+    assert compile_query(pattern, regex=True).terms == [literal]
+
+# 3. リテラルで絞り込んでも全件照合と同じ結果になる
+@pytest.mark.parametrize("keyword,mode", [
+    (r"retrieval\s+gen", "OR"),
+    (r"TUN[a-z]+", "OR"),
+    ([r"prompt", r"v1\d$"], "AND"),
+    ([r"agent", r"^\w+ model"], "OR"),
+    (r"検索\s?拡張", "OR"),
+])
+def test_prefilter_matches_full_scan(tmp_path, keyword, mode):
+    store, db = _stores(tmp_path)
+    raw = keyword if isinstance(keyword, list) else [keyword]
+    expected = []
+    for p in store.get_all():
+        targets = [p["title"], " ".join(p["authors"]), p["summary"]]
+        hits = [any(re.search(kw, t, re.IGNORECASE) for t in targets) for kw in raw]
+        if (all(hits) if mode == "AND" else any(hits)):
+            expected.append(p["id"])
+    assert expected
+    for s in (store, db):
+        assert [p["id"] for p in s.fulltext_search(keyword, regex=True, mode=mode)] == expected
+
+# 4. 照合時間の上限を超えるとTimeoutError（1件の照合の途中でも打ち切る）
+def test_regex_time_limit(tmp_path, monkeypatch):
+    store, db = _stores(tmp_path)
+    monkeypatch.setattr(fulltext_index, "REGEX_TIME_LIMIT", -1)
+    with pytest.raises(TimeoutError):
+        store.fulltext_search(r"z\d", regex=True)
+    monkeypatch.setattr(fulltext_index, "REGEX_TIME_LIMIT", 0.3)
+    slow = {"id": "slow", "title": "t", "authors": [], "summary": "a" * 40}
+    for s in (store, db):
+        s.add(slow)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            s.fulltext_search(r"(a|aa)*[cd]", regex=True)
+        with pytest.raises(TimeoutError):
+            s.fulltext_search_page(r"(a|aa)*[cd]", page_size=500, regex=True)
+        assert time.monotonic() - started < 3
+    assert signal.getsignal(signal.SIGALRM) is signal.SIG_DFL
+    # 不正なパターンは従来どおりre.error
+    monkeypatch.undo()
+    with pytest.raises(re.error):
+        store.fulltext_search(r"(unclosed", regex=True)
+
+# 5. 入れ子の繰り返しの拒否は REJECT_NESTED_REPEATS=True のときだけ
+def test_nested_repeat_rejection_opt_in(tmp_path, monkeypatch):
+    store, _ = _stores(tmp_path)
+    assert store.fulltext_search(r"(\w+\s?)+", regex=True)
+    monkeypatch.setattr(fulltext_index, "REJECT_NESTED_REPEATS", True)
+    with pytest.raises(ValueError):
+        store.fulltext_search(r"(\w+\s?)+", regex=True)
+    with pytest.raises(ValueError):
+        store.fulltext_search(r"(a+)+b", regex=True)
+
+# 6. 正規化で形が変わるテキスト（結合文字・Σ）もリテラルの絞り込みで落とさない
+@pytest.mark.parametrize("keyword,title", [
+    ("cafe", "cafe\u0301 society"),
+    ("ΑΣ", "ΑΣΑ theory"),
+])
+def test_prefilter_keeps_unnormalized_text(tmp_path, keyword, title):
+    store, db = _stores(tmp_path)
+    paper = {"id": "arxiv:raw", "title": title, "authors": ["Eve"], "summary": "none"}
+    store.add(paper)
+    db.add(paper)
+    assert re.search(keyword, title, re.IGNORECASE)
+    for s in (store, db):
+        assert [p["id"] for p in s.fulltext_search(keyword, regex=True)] == ["arxiv:raw"]
+        assert [p["id"] for p in s.fulltext_search_page(keyword, regex=True)["results"]] == ["arxiv:raw"]
+
+# 7. regex_unsafe列の無い古いデータベースは開くときに列を足して値を埋める
+def test_sqlite_migrates_regex_unsafe(tmp_path):
+    db_path = str(tmp_path / "papers.db")
+    db = SQLiteStorage(db_path)
+    db.add({"id": "arxiv:raw", "title": "cafe\u0301 society", "authors": ["Eve"], "summary": "none"})
+    db._conn.execute("DROP INDEX papers_regex_unsafe")
+    db._conn.execute("ALTER TABLE papers DROP COLUMN regex_unsafe")
+    db.close()
+    db = SQLiteStorage(db_path)
+    assert [p["id"] for p in db.fulltext_search("cafe", regex=True)] == ["arxiv:raw"]
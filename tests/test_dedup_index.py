@@ -0,0 +1,59 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:7001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/7001.00001.pdf"
+}
+
+# 1. 正規化タイトルの一致で重複判定できる
+def test_is_duplicate_normalized_title(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    assert store.is_duplicate({"title": "ＰＲＯＭＰＴ engineering  for AI agents"})
+    assert not store.is_duplicate({"title": "Prompt Engineering"})
+
+# 2. 更新・削除後はタイトル・著者の索引が追従する
+def test_is_duplicate_follows_mutations(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    p2 = dict(SAMPLE_PAPER, id="arxiv:other")
+    store.add(p2)
+    store.delete(SAMPLE_PAPER["id"])
+    assert store.is_duplicate({"title": SAMPLE_PAPER["title"]})
+    store.update("arxiv:other", dict(p2, title="Renamed", authors=["Carol"]))
+    assert not store.is_duplicate({"title": SAMPLE_PAPER["title"]})
+    assert not store.is_duplicate({"authors": ["Alice", "Bob"]})
+    assert store.is_duplicate({"authors": ["Carol"]})
+
+# 3. 著者リストは順序も含めた完全一致のみ重複とする
+def test_is_duplicate_authors_exact(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(dict(SAMPLE_PAPER, authors=[["Alice"], "Bob"]))
+    assert store.is_duplicate({"authors": [["Alice"], "Bob"]})
+    assert not store.is_duplicate({"authors": ["Bob", "Alice"]})
+
+# 4. filter_newは既存論文・バッチ内重複をまとめて除外する
+def test_filter_new(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    batch = [
+        dict(SAMPLE_PAPER),
+        {"id": "arxiv:a", "title": "New Paper", "authors": ["Dave"]},
+        {"id": "arxiv:a", "title": "Another", "authors": ["Eve"]},
+        {"id": "arxiv:b", "title": "new  paper", "authors": ["Frank"]},
+        {"id": "arxiv:c", "title": "Third", "authors": ["Dave"]},
+        {"id": "arxiv:d", "title": "Fourth", "authors": ["Grace"]},
+    ]
+    assert [p["id"] for p in store.filter_new(batch)] == ["arxiv:a", "arxiv:d"]
+
+# 5. 空のバッチ・空のキーでも例外なく動作
+def test_filter_new_empty(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    assert store.filter_new([]) == []
+    assert len(store.filter_new([{}, {}])) == 2
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+from storage import Storage
+from minhash import MinHashLSH
+
+SAMPLE_PAPER = {
+    "id": "arxiv:6001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "We study how prompt engineering affects the reliability of tool-using AI agents.",
+    "pdf_path": "./pdfs/6001.00001.pdf"
+}
+
+OTHER_SUMMARIES = [
+    "Retrieval augmented generation improves factuality of large language models.",
+    "A benchmark for multilingual question answering over scientific articles.",
+    "大規模言語モデルにおける検索拡張生成の評価手法を提案する。",
+]
+
+def _store(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    for i, summary in enumerate(OTHER_SUMMARIES):
+        store.add({"id": f"arxiv:other{i}", "title": f"Other {i}", "authors": [f"Carol{i}"], "summary": summary})
+    return store
+
+# 1. 似たsummaryはLSH候補経由でも重複候補になる
+def test_lsh_similar_summary(tmp_path):
+    store = _store(tmp_path)
+    query = {"summary": "We study how prompt engineering affects reliability of tool using AI agents!"}
+    dups = store.find_duplicates(query)
+    assert [d["id"] for d in dups] == [SAMPLE_PAPER["id"]]
+
+# 2. 閾値を変更できる
+def test_lsh_threshold_configurable(tmp_path):
+    store = _store(tmp_path)
+    query = {"summary": "We study how prompt engineering affects reliability of tool using AI agents!"}
+    assert store.find_duplicates(query, summary_threshold=1.0) == []
+    assert store.find_duplicates(query, summary_threshold=0.8)
+
+# 3. 更新・削除にLSH索引が追従する
+def test_lsh_follows_mutations(tmp_path):
+    store = _store(tmp_path)
+    query = {"summary": OTHER_SUMMARIES[2]}
+    assert [d["id"] for d in store.find_duplicates(query)] == ["arxiv:other2"]
+    store.update("arxiv:other2", {"id": "arxiv:other2", "title": "Other 2", "authors": ["Carol2"], "summary": "Unrelated."})
+    assert store.find_duplicates(query) == []
+    store.add({"id": "arxiv:new", "title": "New", "authors": ["Dave"], "summary": OTHER_SUMMARIES[2]})
+    assert [d["id"] for d in store.find_duplicates(query)] == ["arxiv:new"]
+    store.delete("arxiv:new")
+    assert store.find_duplicates(query) == []
+
+# 4. 一括APIは1件ずつの結果と一致する
+def test_find_duplicates_many(tmp_path):
+    store = _store(tmp_path)
+    queries = [{"title": "Prompt"}, {"authors": ["Carol1"]}, {"summary": OTHER_SUMMARIES[0]}, {"title": "Nothing"}]
+    assert store.find_duplicates_many(queries) == [store.find_duplicates(q) for q in queries]
+
+# 5. MinHashLSHは同一テキストを必ず候補に含める
+def test_minhash_identical_text():
+    lsh = MinHashLSH()
+    lsh.add("a", "promptengineering")
+    lsh.add("b", "x")
+    assert "a" in lsh.query("promptengineering")
+    assert "b" in lsh.query("x")
+    lsh.remove("a")
+    assert "a" not in lsh.query("promptengineering")
+    assert len(lsh) == 1
+
+# 6. num_permがbandsで割り切れない場合は例外
+def test_minhash_invalid_bands():
+    with pytest.raises(ValueError):
+        MinHashLSH(num_perm=10, bands=3)
@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import random
+from storage import Storage
+from fulltext_index import NgramIndex, paper_shadow
+
+SAMPLE_PAPER = {
+    "id": "arxiv:5001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/5001.00001.pdf"
+}
+
+WORDS = ["prompt", "agent", "検索", "拡張", "生成", "ＡＩ", "RAG", "model", "大規模", "言語"]
+
+def _brute_force(store, kws, mode):
+    out = []
+    for p in store._data:
+        sh = paper_shadow(p)
+        fields = (sh.title, sh.authors, sh.summary)
+        hits = [any(kw in f for f in fields) for kw in kws]
+        if (mode == "AND" and all(hits)) or (mode == "OR" and any(hits)):
+            out.append(p["id"])
+    return out
+
+# 1. インデックス経由の結果が全件走査と一致する（日本語・全角含む）
+def test_index_matches_brute_force(tmp_path):
+    rng = random.Random(0)
+    store = Storage(str(tmp_path / "papers.json"))
+    for i in range(200):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"
+        p["title"] = " ".join(rng.sample(WORDS, 3))
+        p["summary"] = "".join(rng.sample(WORDS, 4))
+        store.add(p)
+    for kws in (["prompt"], ["検索拡張"], ["ai"], ["言語", "model"], ["rag", "生成"], ["x"]):
+        for mode in ("AND", "OR"):
+            result = store.fulltext_search(kws, mode=mode)
+            assert [p["id"] for p in result] == _brute_force(store, kws, mode)
+
+# 2. 更新・削除がインデックスに反映される
+def test_index_follows_update_delete(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    assert store.fulltext_search("Engineering")
+    store.update(SAMPLE_PAPER["id"], dict(SAMPLE_PAPER, title="Other", summary="Nothing."))
+    assert store.fulltext_search("Engineering") == []
+    assert store.fulltext_search("Other")
+    store.delete(SAMPLE_PAPER["id"])
+    assert store.fulltext_search("Other") == []
+
+# 3. フィールド境界をまたぐ語はヒットしない
+def test_index_no_cross_field_match(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(dict(SAMPLE_PAPER, title="abc", authors=["def"], summary="ghi"))
+    assert store.fulltext_search("cd") == []
+    assert store.fulltext_search("abc")
+
+# 4. 正規化済みフィールドは追加時に計算され、メモリ使用量を確認できる
+def test_shadow_memory_accounting(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    assert store.shadow_memory_usage() == {"papers": 0, "bytes": 0}
+    store.add(SAMPLE_PAPER)
+    usage = store.shadow_memory_usage()
+    assert usage["papers"] == 1 and usage["bytes"] > 0
+    assert store._shadow[SAMPLE_PAPER["id"]].title == "promptengineeringforaiagents"
+    store.add(SAMPLE_PAPER)
+    assert store.shadow_memory_usage() == usage
+    store.delete(SAMPLE_PAPER["id"])
+    assert store.shadow_memory_usage() == {"papers": 0, "bytes": 0}
+
+# 5. NgramIndexの候補集合（短すぎる語はNone）
+def test_ngram_candidates():
+    index = NgramIndex(n=2)
+    index.add("a", ("promptengineering", "", ""))
+    index.add("b", ("agent", "", ""))
+    assert index.candidates("prompt") == {"a"}
+    assert index.candidates("ent") == {"b"}
+    assert index.candidates("zz") == set()
+    assert index.candidates("p") is None
+    index.remove("a", ("promptengineering", "", ""))
+    assert index.candidates("prompt") == set()
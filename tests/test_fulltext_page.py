@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+import fulltext_index
+from storage import Storage
+from sqlite_storage import SQLiteStorage
+
+def _paper(i):
+    topic = "prompt engineering" if i % 3 else "retrieval augmented generation"
+    return {
+        "id": f"arxiv:{i}",
+        "title": f"Paper {i} on {topic}",
+        "authors": [f"Author {i}"],
+        "summary": f"We study {topic} in setting {i}.",
+        "pdf_path": f"./pdfs/{i}.pdf",
+    }
+
+def _stores(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    papers = [_paper(i) for i in range(25)]
+    store.add_many(papers)
+    db.add_many(papers)
+    return store, db
+
+def _all_pages(s, keyword, page_size, **kwargs):
+    results, cursor, pages = [], None, 0
+    while True:
+        page = s.fulltext_search_page(keyword, page_size=page_size, cursor=cursor, **kwargs)
+        results.extend(page["results"])
+        pages += 1
+        cursor = page["cursor"]
+        if cursor is None:
+            return results, pages
+
+# 1. ページをつなげるとfulltext_searchの結果と同じになり、最後のページのカーソルはNone
+@pytest.mark.parametrize("keyword,kwargs", [
+    ("prompt", {}),
+    (["retrieval", "setting"], {"mode": "AND"}),
+    ("ret.*gen", {"regex": True}),
+    (["prompt", "engineering"], {"order_by_score": True}),
+])
+def test_pages_concatenate_to_full_result(tmp_path, keyword, kwargs):
+    store, db = _stores(tmp_path)
+    expected = store.fulltext_search(keyword, **kwargs)
+    for s in (store, db):
+        results, pages = _all_pages(s, keyword, 4, **kwargs)
+        assert results == expected
+        assert pages == max(1, -(-len(expected) // 4))
+
+# 2. totalは一致件数全体（2文字語は転置リストの件数をそのまま使う）
+@pytest.mark.parametrize("keyword", ["prompt", "pr", ["ge", "se"]])
+def test_total_counts_all_matches(tmp_path, keyword):
+    store, db = _stores(tmp_path)
+    expected = len(store.fulltext_search(keyword))
+    for s in (store, db):
+        page = s.fulltext_search_page(keyword, page_size=3, with_total=True)
+        assert page["total"] == expected
+        assert len(page["results"]) == 3
+        assert s.fulltext_search_page(keyword, page_size=3)["total"] is None
+
+# 3. 壊れたカーソル・別の検索条件のカーソル・不正なpage_sizeはValueError
+def test_invalid_cursor(tmp_path):
+    store, db = _stores(tmp_path)
+    for s in (store, db):
+        cursor = s.fulltext_search_page("prompt", page_size=2)["cursor"]
+        with pytest.raises(ValueError):
+            s.fulltext_search_page("retrieval", page_size=2, cursor=cursor)
+        with pytest.raises(ValueError):
+            s.fulltext_search_page("prompt", page_size=2, cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            s.fulltext_search_page("prompt", page_size=0)
+
+# 4. 並べ替えが無ければ1ページ分（と続きの有無を知る1件）を見つけた時点で照合をやめる
+def test_stops_after_page(tmp_path, monkeypatch):
+    store, _ = _stores(tmp_path)
+    calls = []
+    real = fulltext_index.match_paper
+    def counting(*args):
+        calls.append(1)
+        return real(*args)
+    monkeypatch.setattr(fulltext_index, "match_paper", counting)
+    store.fulltext_search_page("setting", page_size=3)
+    assert len(calls) == 4
+    calls.clear()
+    store.fulltext_search("setting", limit=3)
+    assert len(calls) == 3
+
+# 5. ハイライトは返すページにだけ行う
+def test_highlight_only_page(tmp_path, monkeypatch):
+    store, _ = _stores(tmp_path)
+    calls = []
+    real = fulltext_index.Highlighter.highlight
+    def counting(self, text):
+        calls.append(text)
+        return real(self, text)
+    monkeypatch.setattr(fulltext_index.Highlighter, "highlight", counting)
+    page = store.fulltext_search_page("prompt", page_size=2, highlight=True)
+    assert all("<mark>" in p["title"] for p in page["results"])
+    assert len(calls) == 2 * 3  # タイトル・著者1人・要約
+
+# 6. ページの間に論文が削除されても続きから返す
+def test_cursor_survives_deletion(tmp_path):
+    store, _ = _stores(tmp_path)
+    first = store.fulltext_search_page("setting", page_size=5)
+    store.delete("arxiv:1")
+    page = store.fulltext_search_page("setting", page_size=100, cursor=first["cursor"])
+    assert [p["id"] for p in page["results"]] == [f"arxiv:{i}" for i in range(5, 25)]
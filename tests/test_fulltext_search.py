@@ -336,3 +336,14 @@ def test_fulltext_mock(tmp_path):
     store._data = [{"id": "mock", "title": "Mock Paper", "authors": ["Test"], "summary": "Mock summary.", "pdf_path": "mock.pdf"}]
     result = store.fulltext_search("Mock")
     assert any("Mock" in p["title"] for p in result)
+
+# 抜粋モードではsummaryが一致箇所の周辺だけになる
+def test_fulltext_snippets_mode(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    p = SAMPLE_PAPER.copy()
+    p["summary"] = "Filler sentence about other topics. " * 20 + "Prompt engineering matters. " + "More filler. " * 20
+    store.add(p)
+    res = store.fulltext_search("prompt", snippets=1, snippet_width=40)
+    assert "<mark>Prompt</mark>" in res[0]["summary"]
+    assert len(res[0]["summary"]) < 80
+    assert res[0]["title"] == "<mark>Prompt</mark> Engineering for AI Agents"
@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import highlight
+from highlight import AhoCorasick, Highlighter, normalized_offsets
+
+# 1. 正規化で消えた空白は区間に含めず、隣接・重複する一致は1つにまとめる
+def test_intervals_split_and_merge():
+    h = Highlighter(["promptengineering", "engine", "ring"])
+    assert h.highlight("Prompt Engineering") == "<mark>Prompt</mark> <mark>Engineering</mark>"
+    assert Highlighter(["ab", "bc"]).highlight("xabcx") == "x<mark>abc</mark>x"
+
+# 2. 全角・合字など1文字が複数文字に展開される場合も元の文字単位で囲む
+def test_expanding_characters():
+    assert Highlighter(["fi"]).highlight("ﬁle") == "<mark>ﬁ</mark>le"
+    assert Highlighter(["ai"]).highlight("ＡＩ agent") == "<mark>ＡＩ</mark> agent"
+
+# 3. 同じキーワードの重なる出現は左から重ならないものだけを取る
+def test_non_overlapping_per_keyword():
+    assert Highlighter(["aa"]).highlight("aaa") == "<mark>aa</mark>a"
+
+# 4. Aho–Corasickの照合結果はキーワードごとのstr.findと一致する
+def test_aho_corasick_matches_find(monkeypatch):
+    keywords = ["he", "she", "his", "hers", "aa", "a"]
+    text = "ushers his aaa she"
+    found = sorted((s, e, keywords[i]) for s, e, i in AhoCorasick(keywords).finditer(text))
+    expected = sorted((i, i + len(k), k) for k in keywords for i in range(len(text)) if text.startswith(k, i))
+    assert found == expected
+    plain = Highlighter(keywords).highlight(text)
+    monkeypatch.setattr(highlight, "AHO_CORASICK_MIN_KEYWORDS", 1)
+    assert Highlighter(keywords).highlight(text) == plain
+
+# 5. 正規化の対応表はキャッシュされ、位置が変わらないASCIIでは作らない
+def test_offsets_cached():
+    text = "Retrieval Augmented Generation"
+    assert normalized_offsets(text) is normalized_offsets(text)
+    norm, offsets, removed, _ = normalized_offsets(text)
+    assert norm == "retrievalaugmentedgeneration"
+    assert offsets is None and list(removed) == [9, 19]
+
+# 6. 不正な正規表現は無視し、文字列以外はそのまま返す
+def test_invalid_regex_and_non_string():
+    h = Highlighter(["[", "gen"], regex=True)
+    assert h.highlight("Generation") == "<mark>Gen</mark>eration"
+    assert h.highlight(None) is None
+    assert h.highlight_field(["gen", 3]) == ["<mark>gen</mark>", 3]
+
+LONG = ("Large language models are evaluated on many benchmarks. " * 5
+        + "Retrieval augmented generation with retrieval of passages improves retrieval quality. "
+        + "Unrelated filler text about datasets and training. " * 5
+        + "A short note on retrieval.")
+
+# 7. 抜粋は一致の密度が高い窓から選ばれ、省略部分は…でつながる
+def test_snippet_prefers_dense_window():
+    h = Highlighter(["retrieval"])
+    windows = h.windows(LONG, width=80, count=1)
+    assert len(windows) == 1
+    a, b = windows[0]
+    assert LONG[a:b].count("retrieval") + LONG[a:b].count("Retrieval") == 3
+    snippet = h.snippet(LONG, width=80, count=1)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert snippet.count("<mark>") == 3
+
+# 8. 窓は一致の途中で切れず、count個までで位置順に並ぶ
+def test_snippet_windows_order_and_bounds():
+    h = Highlighter(["retrieval"])
+    windows = h.windows(LONG, width=30, count=2)
+    assert windows == sorted(windows) and len(windows) == 2
+    for s, e in h.intervals(LONG):
+        assert all(not (a < e and s < b) or (a <= s and e <= b) for a, b in windows)
+    assert len(h.snippet(LONG, width=30, count=2)) < len(LONG) // 2
+
+# 9. 一致が無ければ先頭の窓、短いテキストは全体を返す
+def test_snippet_without_match():
+    h = Highlighter(["zzz"])
+    assert h.snippet(LONG, width=20, count=2) == LONG[:20] + "…"
+    assert Highlighter(["gen"]).snippet("RAG generation", width=50) == "RAG <mark>gen</mark>eration"
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import arxiv_client
+from http_transport import Transport, get_default_transport
+from pdf_downloader import download_pdf
+
+FEED = (b'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        b'<entry><id>http://arxiv.org/abs/2405.00001v1</id><title>Stub</title>'
+        b'<summary>Stub summary</summary><author><name>A</name></author></entry></feed>')
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fail_first = 0
+
+    def do_GET(self):
+        if _Handler.fail_first > 0:
+            _Handler.fail_first -= 1
+            self._send(503, b"busy", "text/plain")
+        elif self.path.startswith("/pdf"):
+            self._send(200, b"%PDF-1.4 stub", "application/pdf")
+        else:
+            self._send(200, FEED, "application/atom+xml")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    _Handler.fail_first = 0
+
+# 1. keep-aliveで接続が再利用され、その回数を数えられる
+def test_transport_reuses_connections(server):
+    transport = Transport(pool_size=2)
+    for _ in range(3):
+        assert transport.get(server + "/").status_code == 200
+    assert transport.stats() == {"opened": 1, "reused": 2, "requests": 3}
+    transport.close()
+
+# 2. リトライ設定で5xxを再試行できる
+def test_transport_retry_policy(server):
+    _Handler.fail_first = 2
+    transport = Transport(retries=3, backoff_factor=0)
+    assert transport.get(server + "/").status_code == 200
+    transport.close()
+
+# 3. 既定（retries=0）ではステータスをそのまま返す
+def test_transport_no_retry_by_default(server):
+    _Handler.fail_first = 1
+    transport = Transport()
+    assert transport.get(server + "/").status_code == 503
+    transport.close()
+
+# 4. arxiv_clientとpdf_downloaderで同じTransportを共有できる
+def test_transport_shared_by_modules(server, tmp_path):
+    transport = Transport()
+    with patch("arxiv_client.BASE_URL", server + "/api/query"):
+        results = arxiv_client.search_arxiv("stub", session=transport)
+    assert results[0]["title"] == "Stub"
+    assert download_pdf(server + "/pdf/1", str(tmp_path / "1.pdf"), session=transport) is True
+    stats = transport.stats()
+    assert stats["requests"] == 2 and stats["reused"] == 1
+    transport.close()
+
+# 5. 既定のTransportはプロセス内で共有される
+def test_default_transport_singleton():
+    assert get_default_transport() is get_default_transport()
+
+# 6. arxiv_clientはTransport(timeout=...)の設定を使う
+def test_arxiv_client_uses_transport_timeout(server):
+    transport = Transport(timeout=3.5)
+    seen = []
+    real_get = transport.session.get
+    def spy(url, **kwargs):
+        seen.append(kwargs.get("timeout"))
+        return real_get(url, **kwargs)
+    transport.session.get = spy
+    with patch("arxiv_client.BASE_URL", server + "/api/query"):
+        assert arxiv_client.search_arxiv("stub", session=transport)[0]["title"] == "Stub"
+    assert seen == [3.5]
+    transport.close()
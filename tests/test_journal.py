@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import pytest
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:3001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/3001.00001.pdf"
+}
+
+# 1. ジャーナルモードでは変更ごとに1行追記され、スナップショットは書き換えない
+def test_journal_appends_one_line(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True)
+    store.add(SAMPLE_PAPER)
+    store.record_access(SAMPLE_PAPER["id"])
+    store.close()
+    with open(json_path + ".journal") as f:
+        lines = f.readlines()
+    assert len(lines) == 2
+    with open(json_path) as f:
+        assert json.load(f) == []
+
+# 2. 再起動時にジャーナルが再適用される
+def test_journal_replay(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True)
+    for i in range(3):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; store.add(p)
+    update = SAMPLE_PAPER.copy(); update["id"] = "arxiv:1"; update["title"] = "Changed"
+    store.update("arxiv:1", update)
+    store.delete("arxiv:0")
+    store.record_access("arxiv:2")
+    store.record_access("arxiv:2")
+    store.close()
+    store2 = Storage(json_path, journal=True)
+    assert [p["id"] for p in store2.get_all()] == ["arxiv:1", "arxiv:2"]
+    assert store2.get_by_id("arxiv:1")["title"] == "Changed"
+    assert store2.get_access_count("arxiv:2") == 2
+
+# 3. compactでスナップショットに畳み込まれジャーナルが消える
+def test_journal_compact(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True)
+    store.add(SAMPLE_PAPER)
+    store.record_access(SAMPLE_PAPER["id"])
+    store.compact()
+    assert not os.path.exists(json_path + ".journal")
+    with open(json_path) as f:
+        assert json.load(f)[0]["id"] == SAMPLE_PAPER["id"]
+    assert Storage(json_path).get_access_count(SAMPLE_PAPER["id"]) == 1
+
+# 4. compact_everyに達すると自動でコンパクションされる
+def test_journal_auto_compact(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True, compact_every=5)
+    for i in range(7):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; store.add(p)
+    store.close()
+    with open(json_path) as f:
+        assert len(json.load(f)) == 5
+    with open(json_path + ".journal") as f:
+        assert len(f.readlines()) == 2
+    assert len(Storage(json_path, journal=True).get_all()) == 7
+
+# 5. 末尾行が壊れていても直前までの変更は復元される
+def test_journal_truncated_tail(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True, fsync="never")
+    store.add(SAMPLE_PAPER)
+    store.close()
+    with open(json_path + ".journal", "a") as f:
+        f.write('{"op": "add", "paper": {"id": "arx')
+    store2 = Storage(json_path, journal=True)
+    assert [p["id"] for p in store2.get_all()] == [SAMPLE_PAPER["id"]]
+
+# 6. 不正なfsyncポリシーは例外
+def test_journal_invalid_fsync(tmp_path):
+    with pytest.raises(ValueError):
+        Storage(str(tmp_path / "papers.json"), journal=True, fsync="sometimes")
+
+# 7. ジャーナルを使わないStorageで開くとジャーナルを畳み込み、以後の変更が巻き戻らない
+@pytest.mark.parametrize("shared", [False, True])
+def test_unjournaled_store_folds_journal(tmp_path, shared):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True, compact_every=0)
+    store.add(SAMPLE_PAPER)
+    store.close()
+    plain = Storage(json_path, shared=shared)
+    assert not os.path.exists(json_path + ".journal")
+    plain.delete(SAMPLE_PAPER["id"])
+    assert Storage(json_path).get_all() == []
+    assert Storage(json_path, journal=True).get_all() == []
+
+# 8. 共有モードでジャーナル利用のプロセスと混在しても、読み込みは再帰せず書き込み時に畳み込む
+def test_shared_mixed_journal_modes(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    journaled = Storage(json_path, journal=True, compact_every=0, shared=True)
+    plain = Storage(json_path, shared=True)
+    journaled.add(SAMPLE_PAPER)
+    assert plain.get_by_id(SAMPLE_PAPER["id"])["id"] == SAMPLE_PAPER["id"]
+    plain.add(dict(SAMPLE_PAPER, id="arxiv:3001.00002"))
+    assert not os.path.exists(json_path + ".journal")
+    journaled.delete(SAMPLE_PAPER["id"])
+    assert [p["id"] for p in plain.get_all()] == ["arxiv:3001.00002"]
+    journaled.close()
+    assert [p["id"] for p in Storage(json_path).get_all()] == ["arxiv:3001.00002"]
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import threading
+import time
+from unittest.mock import Mock
+from pdf_downloader import download_many
+
+PDF_BYTES = b"%PDF-1.4 dummy"
+
+def _resp(status=200, content_type="application/pdf", body=PDF_BYTES):
+    resp = Mock()
+    resp.status_code = status
+    resp.headers = {"Content-Type": content_type}
+    resp.iter_content = lambda chunk_size: [body]
+    return resp
+
+# 1. 複数ジョブを並列にダウンロードし結果を報告する
+def test_download_many_success(tmp_path):
+    session = Mock()
+    session.get.side_effect = lambda url, **kw: _resp()
+    jobs = [(f"https://arxiv.org/pdf/{i}.pdf", str(tmp_path / f"{i}.pdf")) for i in range(5)]
+    report = download_many(jobs, concurrency=3, session=session)
+    assert report["succeeded"] == 5 and report["failed"] == 0
+    assert [r["save_path"] for r in report["results"]] == [j[1] for j in jobs]
+    assert all((tmp_path / f"{i}.pdf").read_bytes() == PDF_BYTES for i in range(5))
+
+# 2. 429/5xxはバックオフ付きで再試行する
+def test_download_many_retry(tmp_path):
+    session = Mock()
+    session.get.side_effect = [_resp(429), _resp(503), _resp()]
+    report = download_many([("https://arxiv.org/pdf/1.pdf", str(tmp_path / "1.pdf"))], retries=3, backoff=0, session=session)
+    assert report["results"][0]["ok"] is True
+    assert report["results"][0]["attempts"] == 3
+
+# 3. 404や検証エラーは再試行しない
+def test_download_many_no_retry(tmp_path):
+    session = Mock()
+    session.get.side_effect = [_resp(404), _resp(content_type="text/html")]
+    jobs = [("https://arxiv.org/pdf/1.pdf", str(tmp_path / "1.pdf")),
+            {"url": "https://arxiv.org/pdf/2.pdf", "save_path": str(tmp_path / "2.pdf")}]
+    report = download_many(jobs, concurrency=1, backoff=0, session=session)
+    assert report["failed"] == 2
+    assert [r["attempts"] for r in report["results"]] == [1, 1]
+    assert report["results"][0]["error"] == "HTTP error: 404"
+    assert report["results"][1]["error"] == "Content is not PDF."
+
+# 4. 再試行回数を超えたら失敗として報告する
+def test_download_many_retry_exhausted(tmp_path):
+    session = Mock()
+    session.get.side_effect = Exception("boom")
+    report = download_many([("https://arxiv.org/pdf/1.pdf", str(tmp_path / "1.pdf"))], retries=2, backoff=0, session=session)
+    assert report["results"][0] == {"url": "https://arxiv.org/pdf/1.pdf", "save_path": str(tmp_path / "1.pdf"),
+                                     "ok": False, "attempts": 3, "error": "Network error or timeout."}
+
+# 5. ホストごとの同時接続数上限を守る
+def test_download_many_per_host_limit(tmp_path):
+    active = {}
+    peak = {}
+    lock = threading.Lock()
+    def fake_get(url, **kw):
+        host = url.split("/")[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.02)
+        with lock:
+            active[host] -= 1
+        return _resp()
+    session = Mock()
+    session.get.side_effect = fake_get
+    jobs = [(f"https://{h}/pdf/{i}.pdf", str(tmp_path / f"{h}-{i}.pdf")) for h in ("a.org", "b.org") for i in range(6)]
+    report = download_many(jobs, concurrency=8, per_host=2, session=session)
+    assert report["succeeded"] == 12
+    assert peak == {"a.org": 2, "b.org": 2}
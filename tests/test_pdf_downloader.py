@@ -34,7 +34,7 @@ def test_invalid_url_raises(tmp_path):
 
 # 5. ネットワークエラー時に例外
 def test_network_error(tmp_path):
-    with patch("pdf_downloader.requests.get", side_effect=Exception):
+    with patch("pdf_downloader.requests.Session.get", side_effect=Exception):
         with pytest.raises(Exception):
             download_pdf(PDF_URL, str(tmp_path / TEMP_FILE))
 
@@ -56,7 +56,7 @@ def test_non_pdf_content(tmp_path):
     mock_resp.status_code = 200
     mock_resp.headers = {"Content-Type": "text/html"}
     mock_resp.iter_content = lambda chunk_size: [b"not pdf"]
-    with patch("pdf_downloader.requests.get", return_value=mock_resp):
+    with patch("pdf_downloader.requests.Session.get", return_value=mock_resp):
         with pytest.raises(Exception):
             download_pdf(PDF_URL, str(tmp_path / TEMP_FILE))
 
@@ -67,7 +67,7 @@ def test_empty_url(tmp_path):
 
 # 10. タイムアウト時に例外
 def test_timeout(tmp_path):
-    with patch("pdf_downloader.requests.get", side_effect=TimeoutError):
+    with patch("pdf_downloader.requests.Session.get", side_effect=TimeoutError):
         with pytest.raises(Exception):
             download_pdf(PDF_URL, str(tmp_path / TEMP_FILE))
 
@@ -77,7 +77,7 @@ def test_zero_file_size(tmp_path):
     mock_resp.status_code = 200
     mock_resp.headers = {"Content-Type": "application/pdf"}
     mock_resp.iter_content = lambda chunk_size: [b""]
-    with patch("pdf_downloader.requests.get", return_value=mock_resp):
+    with patch("pdf_downloader.requests.Session.get", return_value=mock_resp):
         with pytest.raises(Exception):
             download_pdf(PDF_URL, str(tmp_path / TEMP_FILE))
 
@@ -87,7 +87,7 @@ def test_too_large_file(tmp_path):
     mock_resp.status_code = 200
     mock_resp.headers = {"Content-Type": "application/pdf"}
     mock_resp.iter_content = lambda chunk_size: [b"0" * (11 * 1024 * 1024)]  # 11MB
-    with patch("pdf_downloader.requests.get", return_value=mock_resp):
+    with patch("pdf_downloader.requests.Session.get", return_value=mock_resp):
         with pytest.raises(Exception):
             download_pdf(PDF_URL, str(tmp_path / TEMP_FILE))
 
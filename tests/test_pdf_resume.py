@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import pytest
+import requests
+from unittest.mock import patch, Mock
+from pdf_downloader import download_pdf
+
+PDF_URL = "https://arxiv.org/pdf/2101.00001.pdf"
+PDF_BYTES = b"%PDF-1.4 " + b"x" * 100
+ETAG = '"v1"'
+
+def _write_part(tmp_path, data, validator=ETAG):
+    (tmp_path / "paper.pdf.part").write_bytes(data)
+    (tmp_path / "paper.pdf.part.meta").write_text(json.dumps({"validator": validator}))
+
+def _resp(status, body=b"", headers=None, fail_after=None):
+    resp = Mock()
+    resp.status_code = status
+    resp.headers = {"Content-Type": "application/pdf", **(headers or {})}
+    def iter_content(chunk_size):
+        yield body[:fail_after] if fail_after is not None else body
+        if fail_after is not None:
+            raise requests.exceptions.ConnectionError("dropped")
+    resp.iter_content = iter_content
+    return resp
+
+# 1. 途中切断時は.partが残り、Rangeで続きから再開できる
+def test_resume_after_drop(tmp_path):
+    target = tmp_path / "paper.pdf"
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, PDF_BYTES, headers={"ETag": ETAG}, fail_after=40)):
+        with pytest.raises(Exception):
+            download_pdf(PDF_URL, str(target), resume=True)
+    assert not target.exists()
+    assert (tmp_path / "paper.pdf.part").read_bytes() == PDF_BYTES[:40]
+    resp = _resp(206, PDF_BYTES[40:], headers={"Content-Range": f"bytes 40-{len(PDF_BYTES) - 1}/{len(PDF_BYTES)}"})
+    with patch("pdf_downloader.requests.Session.get", return_value=resp) as get:
+        assert download_pdf(PDF_URL, str(target), resume=True) is True
+    assert get.call_args.kwargs["headers"] == {"Range": "bytes=40-", "If-Range": ETAG}
+    assert target.read_bytes() == PDF_BYTES
+    assert not (tmp_path / "paper.pdf.part").exists()
+    assert not (tmp_path / "paper.pdf.part.meta").exists()
+
+# 2. Range非対応（200応答）の場合は最初から書き直す
+def test_resume_server_ignores_range(tmp_path):
+    target = tmp_path / "paper.pdf"
+    _write_part(tmp_path, b"garbage")
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, PDF_BYTES)):
+        download_pdf(PDF_URL, str(target), resume=True)
+    assert target.read_bytes() == PDF_BYTES
+
+# 3. 416応答は.partが完成済みとして扱う
+def test_resume_range_not_satisfiable(tmp_path):
+    target = tmp_path / "paper.pdf"
+    _write_part(tmp_path, PDF_BYTES)
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(416)):
+        download_pdf(PDF_URL, str(target), resume=True)
+    assert target.read_bytes() == PDF_BYTES
+
+# 4. %PDFで始まらない場合は.partを削除して例外、保存先は作られない
+def test_resume_not_pdf(tmp_path):
+    target = tmp_path / "paper.pdf"
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, b"<html>")):
+        with pytest.raises(Exception):
+            download_pdf(PDF_URL, str(target), resume=True)
+    assert not target.exists()
+    assert not (tmp_path / "paper.pdf.part").exists()
+
+# 5. サイズ上限超過は.partを削除して例外
+def test_resume_too_large(tmp_path):
+    target = tmp_path / "paper.pdf"
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, b"%PDF" + b"0" * (2 * 1024 * 1024))):
+        with pytest.raises(Exception):
+            download_pdf(PDF_URL, str(target), resume=True, max_size_mb=1)
+    assert not (tmp_path / "paper.pdf.part").exists()
+
+# 6. Content-Rangeの開始位置が食い違う場合は例外
+def test_resume_bad_content_range(tmp_path):
+    target = tmp_path / "paper.pdf"
+    _write_part(tmp_path, PDF_BYTES[:40])
+    resp = _resp(206, PDF_BYTES[10:], headers={"Content-Range": f"bytes 10-{len(PDF_BYTES) - 1}/{len(PDF_BYTES)}"})
+    with patch("pdf_downloader.requests.Session.get", return_value=resp):
+        with pytest.raises(Exception):
+            download_pdf(PDF_URL, str(target), resume=True)
+    assert not target.exists()
+
+# 7. If-Rangeが一致せず200で全体が返った場合は最初から書き直し、新しい版の検証子を残す
+def test_resume_remote_changed(tmp_path):
+    target = tmp_path / "paper.pdf"
+    new_bytes = b"%PDF-1.5 " + b"y" * 100
+    _write_part(tmp_path, PDF_BYTES[:40])
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, new_bytes, headers={"ETag": '"v2"'}, fail_after=50)):
+        with pytest.raises(Exception):
+            download_pdf(PDF_URL, str(target), resume=True)
+    assert (tmp_path / "paper.pdf.part").read_bytes() == new_bytes[:50]
+    assert json.loads((tmp_path / "paper.pdf.part.meta").read_text()) == {"validator": '"v2"'}
+
+# 8. 検証子のない.partは継ぎ足さず、Rangeなしで最初から取り直す
+def test_resume_without_validator(tmp_path):
+    target = tmp_path / "paper.pdf"
+    (tmp_path / "paper.pdf.part").write_bytes(b"stale")
+    with patch("pdf_downloader.requests.Session.get", return_value=_resp(200, PDF_BYTES)) as get:
+        assert download_pdf(PDF_URL, str(target), resume=True) is True
+    assert get.call_args.kwargs["headers"] == {}
+    assert target.read_bytes() == PDF_BYTES
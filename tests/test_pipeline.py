@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from storage import Storage
+from pipeline import harvest, run_harvest, pdf_filename
+
+def _papers(n, pulled=None):
+    for i in range(n):
+        if pulled is not None:
+            pulled.append(i)
+        yield {"id": f"http://arxiv.org/abs/2408.{i:05d}v1", "title": f"Paper {i}", "authors": [f"Author {i}"],
+               "summary": f"Summary {i}", "pdf_url": f"http://arxiv.org/pdf/2408.{i:05d}v1"}
+
+def _fake_download(url, save_path, **kwargs):
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, "wb") as f:
+        f.write(b"%PDF-1.4")
+    return True
+
+# 1. 検索→ダウンロード→保存が一通り実行される
+def test_pipeline_end_to_end(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    with patch("pipeline.iter_arxiv", return_value=_papers(10)), \
+            patch("pipeline.download_pdf", side_effect=_fake_download):
+        report = run_harvest("prompt", store, str(tmp_path / "pdfs"), download_workers=3, queue_size=2)
+    assert report["found"] == 10 and report["stored"] == 10 and report["failed"] == 0
+    paper = store.get_by_id("http://arxiv.org/abs/2408.00003v1")
+    assert paper["pdf_path"] == str(tmp_path / "pdfs" / "2408.00003v1.pdf")
+    assert os.path.exists(paper["pdf_path"])
+
+# 2. 既存論文はスキップし、取得失敗した論文は保存しない
+def test_pipeline_skip_and_failures(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add({"id": "http://arxiv.org/abs/2408.00000v1", "title": "Paper 0", "authors": ["Author 0"], "summary": "S"})
+    def flaky(url, save_path, **kwargs):
+        if url.endswith("00002v1"):
+            raise Exception("HTTP error: 404")
+        return _fake_download(url, save_path)
+    with patch("pipeline.iter_arxiv", return_value=_papers(4)), patch("pipeline.download_pdf", side_effect=flaky):
+        report = run_harvest("prompt", store, str(tmp_path / "pdfs"))
+    assert report["skipped"] == 1 and report["failed"] == 1 and report["stored"] == 2
+    assert report["errors"] == [{"id": "http://arxiv.org/abs/2408.00002v1", "error": "HTTP error: 404"}]
+    assert store.get_by_id("http://arxiv.org/abs/2408.00002v1") is None
+
+# 3. 下流が詰まっている間は検索結果を先読みしすぎない（バックプレッシャ）
+def test_pipeline_backpressure(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    pulled = []
+    release = threading.Event()
+    def blocked(url, save_path, **kwargs):
+        release.wait(5)
+        return _fake_download(url, save_path)
+    async def scenario():
+        task = asyncio.ensure_future(harvest("prompt", store, str(tmp_path / "pdfs"), download_workers=1, queue_size=2))
+        await asyncio.sleep(0.3)
+        seen = len(pulled)
+        release.set()
+        report = await task
+        return seen, report
+    with patch("pipeline.iter_arxiv", return_value=_papers(50, pulled)), patch("pipeline.download_pdf", side_effect=blocked):
+        seen, report = asyncio.run(scenario())
+    assert seen <= 5
+    assert report["stored"] == 50
+
+# 4. キャンセルすると全段が止まり、CancelledErrorが伝わる
+def test_pipeline_cancel(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    def slow(url, save_path, **kwargs):
+        time.sleep(0.05)
+        return _fake_download(url, save_path)
+    async def scenario():
+        task = asyncio.ensure_future(harvest("prompt", store, str(tmp_path / "pdfs"), download_workers=2, queue_size=2))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    with patch("pipeline.iter_arxiv", return_value=_papers(1000)), patch("pipeline.download_pdf", side_effect=slow):
+        asyncio.run(scenario())
+    assert 0 < len(store.get_all()) < 1000
+
+# 5. 検索段の例外は呼び出し元に伝わる
+def test_pipeline_search_error(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    def failing():
+        yield from _papers(2)
+        raise ConnectionError("Network error occurred.")
+    with patch("pipeline.iter_arxiv", return_value=failing()), patch("pipeline.download_pdf", side_effect=_fake_download):
+        with pytest.raises(ConnectionError):
+            run_harvest("prompt", store, str(tmp_path / "pdfs"))
+
+# 6. PDFファイル名はIDから安全な名前を作る
+def test_pdf_filename():
+    assert pdf_filename("http://arxiv.org/abs/2401.00001v1") == "2401.00001v1.pdf"
+    assert pdf_filename("http://arxiv.org/abs/hep-th/9901001v1") == "hep-th_9901001v1.pdf"
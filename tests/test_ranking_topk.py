@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import random
+import pytest
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:9201.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/9201.00001.pdf"
+}
+
+def _full_sort(store, filter_keyword=None):
+    papers = store.get_all()
+    if filter_keyword:
+        papers = [p for p in papers if filter_keyword.lower() in p["title"].lower()]
+    return sorted(papers, key=lambda p: (-store.get_access_count(p["id"]), p["id"]))
+
+def _store(tmp_path, **kwargs):
+    store = Storage(str(tmp_path / "papers.json"), journal=True, fsync="never", **kwargs)
+    for i in range(30):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i:02d}"; p["title"] = f"{'Agents' if i % 3 else 'RAG'} paper {i}"
+        store.add(p)
+    return store
+
+# 1. limit指定時の上位件数が全件ソートと一致する
+@pytest.mark.parametrize("ranking_index", [False, True])
+def test_topk_matches_full_sort(tmp_path, ranking_index):
+    store = _store(tmp_path, ranking_index=ranking_index)
+    rng = random.Random(0)
+    for _ in range(200):
+        store.record_access(f"arxiv:{rng.randrange(30):02d}")
+    for limit in (1, 5, 20, 100):
+        assert store.get_ranking(limit=limit) == _full_sort(store)[:limit]
+        assert store.get_ranking(limit=limit, filter_keyword="rag") == _full_sort(store, "rag")[:limit]
+    assert store.get_ranking() == _full_sort(store)
+
+# 2. 順位表は追加・更新・削除・リセット・バッファ中の増分に追従する
+def test_ranking_index_follows_changes(tmp_path):
+    store = _store(tmp_path, ranking_index=True, buffer_access=True, flush_interval=3600)
+    store.get_ranking(limit=3)
+    store.record_access("arxiv:05")
+    store.record_access("arxiv:05")
+    store.record_access("arxiv:07")
+    assert [p["id"] for p in store.get_ranking(limit=2)] == ["arxiv:05", "arxiv:07"]
+    store.reset_access("arxiv:05")
+    store.delete("arxiv:07")
+    p = SAMPLE_PAPER.copy(); p["id"] = "arxiv:99"; store.add(p)
+    store.record_access("arxiv:99")
+    store.update("arxiv:00", dict(SAMPLE_PAPER, id="arxiv:zz"))
+    store.flush()
+    assert store.get_ranking() == _full_sort(store)
+    assert store.get_ranking(limit=1)[0]["id"] == "arxiv:99"
+
+# 3. 新着順・その他の並びでもlimitが効く
+def test_ranking_newest_limit(tmp_path):
+    store = _store(tmp_path)
+    assert [p["id"] for p in store.get_ranking(order="newest", limit=2)] == ["arxiv:29", "arxiv:28"]
+    assert [p["id"] for p in store.get_ranking(order="added", limit=2)] == ["arxiv:00", "arxiv:01"]
+    assert len(store.get_ranking(order="newest", limit=100)) == 30
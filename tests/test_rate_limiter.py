@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import time
+import threading
+import multiprocessing
+import pytest
+from email.utils import formatdate
+from unittest.mock import patch, Mock
+from arxiv_client import search_arxiv
+from rate_limiter import RateLimiter, parse_retry_after
+
+FEED = (b'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        b'<entry><id>http://arxiv.org/abs/2407.00001v1</id><title>Limited</title>'
+        b'<summary>S</summary><author><name>A</name></author></entry></feed>')
+
+def _resp(status, headers=None):
+    resp = Mock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    resp.iter_content = lambda chunk_size: [FEED]
+    return resp
+
+def _acquire_many(state_path, n):
+    limiter = RateLimiter(rate=20, burst=1, state_path=state_path)
+    for _ in range(n):
+        limiter.acquire()
+
+# 1. 指定レートでリクエスト間隔が制御される
+def test_limiter_paces_requests():
+    limiter = RateLimiter(rate=20, burst=1)
+    start = time.time()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.time() - start >= 0.18
+
+# 2. burst分は待たずに取得できる
+def test_limiter_burst():
+    limiter = RateLimiter(rate=1, burst=3)
+    start = time.time()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.time() - start < 0.5
+
+# 3. スレッド間で同じバケットを共有する
+def test_limiter_shared_between_threads():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.time()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(3)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.time() - start >= 0.2
+
+# 4. state_path指定でプロセス間でも共有される
+def test_limiter_shared_between_processes(tmp_path):
+    state_path = str(tmp_path / "limiter.json")
+    ctx = multiprocessing.get_context("fork") if hasattr(os, "fork") else multiprocessing.get_context()
+    start = time.time()
+    procs = [ctx.Process(target=_acquire_many, args=(state_path, 5)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    assert time.time() - start >= 0.4
+
+# 5. penalize中は他のワーカーも待たされる
+def test_limiter_penalize_blocks():
+    limiter = RateLimiter(rate=100, burst=5)
+    limiter.penalize(0.2)
+    start = time.time()
+    limiter.acquire()
+    assert time.time() - start >= 0.18
+
+# 6. Retry-After（秒数・HTTP日付・不正値）を解釈できる
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+# 7. 429はRetry-Afterを守って再試行し、上限を超えたら例外
+def test_search_arxiv_retries_on_429():
+    limiter = RateLimiter(rate=1000, burst=10, max_retries=2, backoff_base=0)
+    with patch("arxiv_client.requests.Session.get", side_effect=[_resp(429, {"Retry-After": "0.1"}), _resp(200)]) as get:
+        start = time.time()
+        results = search_arxiv("prompt", rate_limiter=limiter)
+    assert results[0]["title"] == "Limited"
+    assert get.call_count == 2
+    assert time.time() - start >= 0.09
+    with patch("arxiv_client.requests.Session.get", return_value=_resp(429)) as get:
+        with pytest.raises(Exception):
+            search_arxiv("prompt", rate_limiter=limiter)
+    assert get.call_count == 3
@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from arxiv_client import search_arxiv
+from response_cache import ResponseCache
+
+FEED = (b'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        b'<entry><id>http://arxiv.org/abs/2406.00001v1</id><title>Cached Paper</title>'
+        b'<summary>Stub summary</summary><author><name>A</name></author></entry></feed>')
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+
+    def do_GET(self):
+        _Handler.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/atom+xml")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(FEED)))
+        self.end_headers()
+        self.wfile.write(FEED)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    _Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    with patch("arxiv_client.BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}/api/query"):
+        yield _Handler.requests_seen
+    httpd.shutdown()
+    httpd.server_close()
+
+# 1. TTL内の同一クエリはAPIを呼ばずキャッシュから返す
+def test_cache_hit_within_ttl(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), ttl=60)
+    first = search_arxiv("prompt", cache=cache)
+    second = search_arxiv("prompt", cache=cache)
+    assert first == second and second[0]["title"] == "Cached Paper"
+    assert len(server) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+# 2. パラメータが異なれば別エントリになる
+def test_cache_key_by_params(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), ttl=60)
+    search_arxiv("prompt", cache=cache)
+    search_arxiv("prompt", max_results=5, cache=cache)
+    search_arxiv("prompt", search_field="title", cache=cache)
+    assert len(server) == 3
+
+# 3. TTL切れはETagで再検証し、304なら保存済みの結果を返す
+def test_cache_revalidation(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), ttl=0)
+    search_arxiv("prompt", cache=cache)
+    result = search_arxiv("prompt", cache=cache)
+    assert result[0]["title"] == "Cached Paper"
+    assert server[1].get("If-None-Match") == '"v1"'
+    assert cache.stats()["revalidated"] == 1
+
+# 4. 合計サイズ上限を超えると最終利用が古いものから削除される
+def test_cache_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=1200)
+    payload = [{"title": "x" * 300}]
+    for name in ("a", "b", "c"):
+        cache.put(name, payload)
+        time.sleep(0.01)
+    cache.get("a")
+    cache.put("d", payload)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    assert cache.stats()["evictions"] >= 1
+
+# 5. 途中で読み捨てたページはキャッシュしない
+def test_cache_partial_page_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    from arxiv_client import _iter_cached
+    class Resp:
+        headers = {}
+        def iter_content(self, chunk_size):
+            return [FEED]
+        def close(self):
+            pass
+    it = _iter_cached(Resp(), cache, "k")
+    next(it)
+    assert cache.get("k") is None
+
+# 6. 同じキーへの同時書き込みでも失敗せず、一時ファイルも残らない
+def test_cache_concurrent_put(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    key = cache.key({"q": "same"})
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(200):
+                cache.put(key, [{"id": f"{n}-{i}"}])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(cache.get(key)["results"]) == 1
+    assert os.listdir(tmp_path / "cache") == [key + ".json"]
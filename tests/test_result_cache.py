@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+from storage import Storage
+from result_cache import ResultCache
+
+def _paper(i):
+    return {"id": f"arxiv:{i}", "title": f"Prompt Paper {i}", "authors": [f"Author {i}"],
+            "summary": "A study on prompt engineering.", "pdf_path": f"./pdfs/{i}.pdf"}
+
+def _store(tmp_path, **kwargs):
+    store = Storage(str(tmp_path / "papers.json"), result_cache_bytes=1 << 20, **kwargs)
+    store.add_many([_paper(i) for i in range(5)])
+    return store
+
+# 1. 同じ呼び出し（既定値の省略・正規化で同じになる検索語を含む）はキャッシュから返す
+def test_repeated_calls_hit(tmp_path):
+    store = _store(tmp_path)
+    first = store.fulltext_search("prompt", highlight=True)
+    assert store.fulltext_search("prompt", highlight=True, mode="OR") == first
+    store.search("Prompt")
+    store.search("prompt")
+    store.get_ranking(limit=3)
+    store.get_ranking(order="popular", limit=3)
+    stats = store.result_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (3, 3)
+    assert Storage(str(tmp_path / "papers.json")).result_cache_stats() is None
+
+# 2. 変更のたびに世代が進み、古い結果は使われない
+def test_mutations_invalidate(tmp_path):
+    store = _store(tmp_path)
+    assert len(store.search("prompt")) == 5
+    store.add(_paper(5))
+    assert len(store.search("prompt")) == 6
+    store.update("arxiv:0", dict(_paper(0), title="Other", summary="Other"))
+    assert len(store.search("prompt")) == 5
+    store.delete("arxiv:1")
+    assert len(store.search("prompt")) == 4
+    assert store.result_cache_stats()["hits"] == 0
+
+# 3. アクセス数の記録は人気順のランキングだけを無効にする
+@pytest.mark.parametrize("kwargs", [{}, {"buffer_access": True, "flush_interval": 3600}, {"ranking_index": True}])
+def test_access_invalidates_only_popular(tmp_path, kwargs):
+    store = _store(tmp_path, **kwargs)
+    store.get_ranking(order="newest")
+    store.fulltext_search("prompt")
+    assert store.get_ranking()[0]["id"] == "arxiv:0"
+    store.record_access("arxiv:3")
+    assert store.get_ranking()[0]["id"] == "arxiv:3"
+    store.get_ranking(order="newest")
+    store.fulltext_search("prompt")
+    assert store.result_cache_stats()["hits"] == 2
+
+# 4. 返した結果を書き換えてもキャッシュは汚れない
+def test_results_are_copies(tmp_path):
+    store = _store(tmp_path)
+    result, count = store.fulltext_search("prompt", limit=2, return_count=True)
+    result[0]["title"] = "changed"
+    result.append({})
+    again, count2 = store.fulltext_search("prompt", limit=2, return_count=True)
+    assert (len(again), count2) == (2, count)
+    assert again[0]["title"] == "Prompt Paper 0"
+
+# 5. 合計サイズを超えると最終利用が古いものから追い出す
+def test_lru_eviction():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3, 40)
+    cache.put("huge", 4, 1000)
+    assert cache.get("b") == (False, None)
+    assert cache.get("huge") == (False, None)
+    assert cache.get("a") == (True, 1) and cache.get("c") == (True, 3)
+    assert cache.stats() == {"hits": 3, "misses": 2, "evictions": 1, "entries": 2, "bytes": 80}
+
+# 6. shared=Trueでは他プロセスの変更を取り込んでから照会する
+def test_shared_sees_other_writers(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    a = Storage(json_path, shared=True, result_cache_bytes=1 << 20)
+    b = Storage(json_path, shared=True)
+    b.add(_paper(0))
+    assert len(a.search("prompt")) == 1
+    b.add(_paper(1))
+    assert len(a.search("prompt")) == 2
@@ -0,0 +1,161 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import sqlite3
+import pytest
+from storage import Storage
+from sqlite_storage import SQLiteStorage, main, migrate_from_json
+
+PAPERS = [
+    {"id": "arxiv:7001.00001", "title": "Prompt Engineering for AI Agents", "authors": ["Alice", "Bob"],
+     "summary": "We study how prompt engineering affects tool-using AI agents.", "pdf_path": "./pdfs/7001.00001.pdf"},
+    {"id": "arxiv:7001.00002", "title": "Retrieval Augmented Generation", "authors": ["Carol"],
+     "summary": "Retrieval augmented generation improves factuality.", "pdf_path": "./pdfs/7001.00002.pdf"},
+    {"id": "arxiv:7001.00003", "title": "ＡＩ エージェントの評価", "authors": ["Dave", "Alice"],
+     "summary": "大規模言語モデルの検索拡張生成を評価する。", "pdf_path": "./pdfs/7001.00003.pdf"},
+]
+
+def _both(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    for p in PAPERS:
+        store.add(p)
+        db.add(p)
+    return store, db
+
+# 1. 追加・取得・更新・削除がStorageと同じ結果になる
+def test_sqlite_crud(tmp_path):
+    store, db = _both(tmp_path)
+    assert db.get_by_id(PAPERS[1]["id"]) == PAPERS[1]
+    assert db.get_by_id("missing") is None
+    changed = dict(PAPERS[0], title="Changed")
+    for s in (store, db):
+        s.update(PAPERS[0]["id"], changed)
+        s.delete(PAPERS[1]["id"])
+    assert db.get_all() == store.get_all()
+    with pytest.raises(Exception):
+        db.delete("missing")
+    with pytest.raises(Exception):
+        db.update("missing", changed)
+    # 既存の別IDへの変更はStorageと同じ例外で、どちらの論文もそのまま残る
+    for s in (store, db):
+        with pytest.raises(Exception, match="Paper id already exists."):
+            s.update(PAPERS[0]["id"], dict(PAPERS[2], title="Clash"))
+    assert db.get_all() == store.get_all()
+
+# 2. 同じIDの再追加は置き換えで、並び順は変わらない
+def test_sqlite_add_replaces_in_place(tmp_path):
+    store, db = _both(tmp_path)
+    for s in (store, db):
+        s.add(dict(PAPERS[0], title="Replaced"))
+    assert [p["id"] for p in db.get_all()] == [p["id"] for p in store.get_all()]
+    assert db.get_by_id(PAPERS[0]["id"])["title"] == "Replaced"
+    assert db.search("replaced") == store.search("replaced")
+
+# 3. fulltext_searchの結果がStorageと一致する（FTS5の候補＋同じ照合）
+@pytest.mark.parametrize("keyword,kwargs", [
+    ("prompt", {}),
+    ("AI", {}),
+    (["retrieval", "alice"], {"mode": "AND"}),
+    (["retrieval", "alice"], {"mode": "OR"}),
+    ("エージェント", {"highlight": True}),
+    ("retrieval augmented generation", {"exact": True}),
+    ("ret.*gen", {"regex": True}),
+    (["agents", "engineering"], {"order_by_score": True, "limit": 1, "offset": 0}),
+])
+def test_sqlite_fulltext_matches_storage(tmp_path, keyword, kwargs):
+    store, db = _both(tmp_path)
+    assert db.fulltext_search(keyword, **kwargs) == store.fulltext_search(keyword, **kwargs)
+
+# 4. ランキングとアクセス数は再オープン後も保持される
+def test_sqlite_ranking_and_access(tmp_path):
+    store, db = _both(tmp_path)
+    for s in (store, db):
+        s.record_access(PAPERS[2]["id"])
+        s.record_access(PAPERS[2]["id"])
+        s.record_access(PAPERS[1]["id"])
+    db.close()
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    assert db.get_access_count(PAPERS[2]["id"]) == 2
+    for kwargs in ({}, {"order": "newest"}, {"limit": 2}, {"filter_keyword": "retrieval"}, {"filter_keyword": "ai"}):
+        assert db.get_ranking(**kwargs) == store.get_ranking(**kwargs)
+    db.reset_access(PAPERS[2]["id"])
+    assert db.get_ranking()[0]["id"] == PAPERS[1]["id"]
+
+# 5. 重複判定（is_duplicate, filter_new, find_duplicates）がStorageと一致する
+def test_sqlite_duplicates(tmp_path):
+    store, db = _both(tmp_path)
+    probes = [
+        {"id": "new", "title": "prompt engineering for ai agents", "authors": ["Zed"]},
+        {"id": "new", "title": "Unrelated", "authors": ["Carol"]},
+        {"id": "new", "title": "Unrelated", "authors": ["Zed"],
+         "summary": "We study how prompt engineering affects tool using AI agents!"},
+        {"id": "new", "title": "Unrelated", "authors": ["Zed"], "summary": "Something else entirely."},
+    ]
+    for probe in probes:
+        assert db.is_duplicate(probe) == store.is_duplicate(probe)
+        assert db.find_duplicates(probe) == store.find_duplicates(probe)
+    assert db.filter_new(probes) == store.filter_new(probes)
+    assert db.find_duplicates(probes[2]) == [PAPERS[0]]
+
+# 6. add_manyは件数を返し、skipでは既存を残す
+def test_sqlite_add_many(tmp_path):
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    assert db.add_many(PAPERS) == {"inserted": 3, "updated": 0, "skipped": 0}
+    assert db.add_many([dict(PAPERS[0], title="X")], on_conflict="skip") == {"inserted": 0, "updated": 0, "skipped": 1}
+    assert db.get_by_id(PAPERS[0]["id"])["title"] == PAPERS[0]["title"]
+    with pytest.raises(ValueError):
+        db.add_many(PAPERS, on_conflict="merge")
+
+# 7. WALモードで開き、別の接続から読める
+def test_sqlite_wal_mode(tmp_path):
+    db = SQLiteStorage(str(tmp_path / "papers.db"))
+    db.add(PAPERS[0])
+    reader = sqlite3.connect(str(tmp_path / "papers.db"))
+    assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert reader.execute("SELECT COUNT(*) FROM papers").fetchone()[0] == 1
+
+# 8. JSONファイル一式（スナップショット・アクセス数・ジャーナル）から移行できる
+def test_migrate_from_json(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    store.add(PAPERS[0])
+    store.add(PAPERS[1])
+    store.record_access(PAPERS[0]["id"])
+    store = Storage(json_path, journal=True)
+    store.add(PAPERS[2])
+    store.delete(PAPERS[1]["id"])
+    store.record_access(PAPERS[2]["id"])
+    store.close()
+    store = Storage(json_path, journal=True, buffer_access=True, flush_interval=3600)
+    store.record_access(PAPERS[2]["id"])
+    store.record_access(PAPERS[2]["id"])
+    store.close()
+    db_path = str(tmp_path / "papers.db")
+    assert migrate_from_json(json_path, db_path) == {"papers": 2, "access": 2}
+    db = SQLiteStorage(db_path)
+    assert db.get_all() == Storage(json_path).get_all()
+    assert db.get_access_count(PAPERS[0]["id"]) == 1
+    assert db.get_access_count(PAPERS[2]["id"]) == 3
+
+# 9. コマンドラインから移行できる
+def test_migrate_cli(tmp_path, capsys):
+    json_path = str(tmp_path / "papers.json")
+    with open(json_path, "w") as f:
+        json.dump(PAPERS, f)
+    assert main([json_path, str(tmp_path / "papers.db")]) == 0
+    assert "migrated 3 papers" in capsys.readouterr().out
+    assert len(SQLiteStorage(str(tmp_path / "papers.db")).get_all()) == 3
+
+# 10. FTS5が使えない場合もinstrの走査で同じ結果になる
+def test_sqlite_without_fts(tmp_path):
+    store, db = _both(tmp_path)
+    db._fts = False
+    assert db.fulltext_search(["retrieval", "alice"], mode="OR") == store.fulltext_search(["retrieval", "alice"], mode="OR")
+    assert db.search("engineering") == store.search("engineering")
+
+# 11. ディレクトリを指定すると例外
+def test_sqlite_path_is_directory(tmp_path):
+    with pytest.raises(Exception):
+        SQLiteStorage(str(tmp_path))
@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import threading
+import pytest
+import storage
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:8001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/8001.00001.pdf"
+}
+
+def _paper(i):
+    p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"
+    return p
+
+# 1. 保存後は一時ファイルが残らず、.bakに1世代前が残る
+def test_save_keeps_previous_generation(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    store.add(_paper(0))
+    store.add(_paper(1))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    with open(json_path) as f:
+        assert len(json.load(f)) == 2
+    with open(json_path + ".bak") as f:
+        assert len(json.load(f)) == 1
+
+# 2. 書き込み途中で失敗しても本体は前の内容のまま読める
+def test_crash_during_save_keeps_file(tmp_path, monkeypatch):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    store.add(_paper(0))
+    real_replace = os.replace
+    def crash(src, dst):
+        if dst == json_path:
+            raise OSError("killed")
+        real_replace(src, dst)
+    monkeypatch.setattr(storage.os, "replace", crash)
+    with pytest.raises(OSError):
+        store.add(_paper(1))
+    monkeypatch.undo()
+    assert [p["id"] for p in Storage(json_path).get_all()] == ["arxiv:0"]
+
+# 3. 本体が壊れていれば1世代前から読み込む
+def test_fallback_to_previous_generation(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    store.add(_paper(0))
+    store.record_access("arxiv:0")
+    store.record_access("arxiv:0")
+    store.add(_paper(1))
+    for path in (json_path, json_path + ".access.json"):
+        with open(path, "w") as f:
+            f.write('[{"id": "arx')
+    store2 = Storage(json_path)
+    assert [p["id"] for p in store2.get_all()] == ["arxiv:0"]
+    assert store2.get_access_count("arxiv:0") == 1
+
+# 4. 本体が無くても1世代前があればそれを使う
+def test_missing_file_uses_backup(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    store.add(_paper(0))
+    store.add(_paper(1))
+    os.remove(json_path)
+    assert [p["id"] for p in Storage(json_path).get_all()] == ["arxiv:0"]
+
+# 5. 本体も1世代前も壊れていれば例外
+def test_both_generations_broken(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    for path in (json_path, json_path + ".bak"):
+        with open(path, "w") as f:
+            f.write("broken}")
+    with pytest.raises(Exception):
+        Storage(json_path)
+
+# 6. 複数スレッドから同時に保存しても一時ファイルが衝突しない
+@pytest.mark.parametrize("kwargs", [{}, {"buffer_access": True, "flush_every": 7}])
+def test_concurrent_writers(tmp_path, kwargs):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, fsync="never", **kwargs)
+    store.add(_paper(0))
+    errors = []
+    def worker():
+        try:
+            for _ in range(300):
+                store.record_access("arxiv:0")
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.flush()
+    assert errors == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert Storage(json_path).get_all() == [_paper(0)]
+    with open(json_path + ".bak") as f:
+        json.load(f)
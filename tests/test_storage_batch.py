@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import json
+import pytest
+from unittest.mock import patch
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:8001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/8001.00001.pdf"
+}
+
+def _papers(ids, **fields):
+    return [dict(SAMPLE_PAPER, id=f"arxiv:{i}", **fields) for i in ids]
+
+# 1. 一括追加で件数が返り、保存は1回だけ
+def test_add_many_counts_and_single_save(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(_papers([0])[0])
+    with patch.object(Storage, "_save_data", autospec=True, side_effect=Storage._save_data) as save:
+        counts = store.add_many(_papers(range(5), title="New"))
+    assert counts == {"inserted": 4, "updated": 1, "skipped": 0}
+    assert save.call_count == 1
+    assert store.get_by_id("arxiv:0")["title"] == "New"
+    with open(tmp_path / "papers.json") as f:
+        assert len(json.load(f)) == 5
+
+# 2. on_conflict="skip"では既存・バッチ内の重複IDをスキップする
+def test_add_many_skip(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(_papers([0])[0])
+    counts = store.add_many(_papers([0, 1, 1, 2], title="New"), on_conflict="skip")
+    assert counts == {"inserted": 2, "updated": 0, "skipped": 2}
+    assert store.get_by_id("arxiv:0")["title"] == SAMPLE_PAPER["title"]
+    assert [p["id"] for p in store.get_all()] == ["arxiv:0", "arxiv:1", "arxiv:2"]
+
+# 3. ジャーナルモードでは1レコードで記録され、再起動後に復元される
+def test_add_many_journal(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path, journal=True)
+    store.add_many(_papers(range(3)))
+    store.close()
+    with open(json_path + ".journal") as f:
+        assert len(f.readlines()) == 1
+    assert len(Storage(json_path, journal=True).get_all()) == 3
+
+# 4. 追加後は検索・重複判定の索引にも反映される
+def test_add_many_indexes(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add_many([dict(SAMPLE_PAPER, id="arxiv:x", title="Unique Batch Title")])
+    assert store.fulltext_search("batch title")
+    assert store.is_duplicate({"title": "unique batch title"})
+
+# 5. 不正なon_conflictは例外
+def test_add_many_invalid_conflict(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    with pytest.raises(ValueError):
+        store.add_many([SAMPLE_PAPER], on_conflict="merge")
+
+# 6. idのない論文が混ざっていれば、どの論文も反映・保存せずに例外
+def test_add_many_invalid_paper(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    with pytest.raises(ValueError):
+        store.add_many([_papers([0])[0], {"title": "No id"}])
+    assert store.get_all() == []
+    assert not store.fulltext_search("prompt")
+    with open(tmp_path / "papers.json") as f:
+        assert json.load(f) == []
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import pytest
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:4001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/4001.00001.pdf"
+}
+
+def _assert_index_consistent(store):
+    assert store._index == {p["id"]: i for i, p in enumerate(store._data)}
+
+# 1. 追加・更新・削除を繰り返してもIDインデックスが整合する
+def test_index_consistent_after_mutations(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    for i in range(10):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; store.add(p)
+    store.delete("arxiv:3")
+    store.delete("arxiv:0")
+    p = SAMPLE_PAPER.copy(); p["id"] = "arxiv:5"; p["title"] = "Changed"; store.add(p)
+    store.update("arxiv:7", dict(SAMPLE_PAPER, id="arxiv:7", title="Updated"))
+    _assert_index_consistent(store)
+    assert store.get_by_id("arxiv:5")["title"] == "Changed"
+    assert store.get_by_id("arxiv:7")["title"] == "Updated"
+    assert store.get_by_id("arxiv:3") is None
+
+# 2. 読み込み時にインデックスが再構築される
+def test_index_rebuilt_on_load(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    store = Storage(json_path)
+    for i in range(5):
+        p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; store.add(p)
+    store2 = Storage(json_path)
+    _assert_index_consistent(store2)
+    assert store2.get_by_id("arxiv:4")["id"] == "arxiv:4"
+
+# 3. _dataを直接差し替えてもインデックスが追従する
+def test_index_follows_data_assignment(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store._data = [dict(SAMPLE_PAPER, id="mock")]
+    assert store.get_by_id("mock")["id"] == "mock"
+    assert store.is_duplicate({"id": "mock"})
+
+# 4. ID変更を伴う更新でもインデックスが追従する
+def test_index_update_changes_id(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    store.update(SAMPLE_PAPER["id"], dict(SAMPLE_PAPER, id="arxiv:renamed"))
+    assert store.get_by_id(SAMPLE_PAPER["id"]) is None
+    assert store.get_by_id("arxiv:renamed")["id"] == "arxiv:renamed"
+    _assert_index_consistent(store)
+
+# 5. 存在しないIDの更新は例外
+def test_index_update_nonexistent(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    with pytest.raises(Exception):
+        store.update("arxiv:none", SAMPLE_PAPER)
+
+# 6. 既存の別IDへの変更は例外で、どちらの論文もそのまま残る
+def test_index_update_id_collision(tmp_path):
+    store = Storage(str(tmp_path / "papers.json"))
+    store.add(SAMPLE_PAPER)
+    store.add(dict(SAMPLE_PAPER, id="arxiv:other", title="Other"))
+    with pytest.raises(Exception):
+        store.update("arxiv:other", dict(SAMPLE_PAPER, title="Clash"))
+    assert store.get_by_id(SAMPLE_PAPER["id"])["title"] == SAMPLE_PAPER["title"]
+    assert store.get_by_id("arxiv:other")["title"] == "Other"
+    _assert_index_consistent(store)
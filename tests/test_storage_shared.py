@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import multiprocessing
+import pytest
+from storage import Storage
+
+SAMPLE_PAPER = {
+    "id": "arxiv:9001.00001",
+    "title": "Prompt Engineering for AI Agents",
+    "authors": ["Alice", "Bob"],
+    "summary": "A study on prompt engineering.",
+    "pdf_path": "./pdfs/9001.00001.pdf"
+}
+
+def _paper(i):
+    p = SAMPLE_PAPER.copy(); p["id"] = f"arxiv:{i}"; p["title"] = f"Paper {i}"; p["authors"] = [f"Author {i}"]
+    return p
+
+# 1. 別インスタンスの書き込みを上書きせずに取り込む
+@pytest.mark.parametrize("journal", [False, True])
+def test_shared_writers_merge(tmp_path, journal):
+    json_path = str(tmp_path / "papers.json")
+    a = Storage(json_path, journal=journal, shared=True)
+    b = Storage(json_path, journal=journal, shared=True)
+    a.add(_paper(0))
+    b.add(_paper(1))
+    a.record_access("arxiv:0")
+    b.record_access("arxiv:0")
+    assert [p["id"] for p in a.get_all()] == ["arxiv:0", "arxiv:1"]
+    assert a.get_access_count("arxiv:0") == 2
+    assert [p["id"] for p in Storage(json_path).get_all()] == ["arxiv:0", "arxiv:1"]
+
+# 2. 変更が無ければ読み込み時に再パースしない
+def test_shared_reader_skips_reload(tmp_path, monkeypatch):
+    json_path = str(tmp_path / "papers.json")
+    writer = Storage(json_path, shared=True)
+    reader = Storage(json_path, shared=True)
+    writer.add(_paper(0))
+    assert reader.get_by_id("arxiv:0") is not None
+    loads = []
+    monkeypatch.setattr(reader, "_load", lambda: loads.append(1))
+    reader.get_all()
+    reader.search("paper")
+    assert loads == []
+
+# 3. ジャーナルへの追記は続きだけ再適用し、コンパクション後は読み直す
+def test_shared_journal_tail_replay(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    writer = Storage(json_path, journal=True, shared=True, compact_every=3)
+    reader = Storage(json_path, journal=True, shared=True)
+    writer.add(_paper(0))
+    writer.add(_paper(1))
+    assert len(reader.get_all()) == 2
+    assert reader._journal_offset == os.path.getsize(json_path + ".journal")
+    writer.add(_paper(2))
+    assert not os.path.exists(json_path + ".journal")
+    reader.add(_paper(3))
+    assert [p["id"] for p in writer.get_all()] == ["arxiv:0", "arxiv:1", "arxiv:2", "arxiv:3"]
+
+# 4. shared=Falseでは従来どおり自分のスナップショットのみを見る
+def test_unshared_does_not_reload(tmp_path):
+    json_path = str(tmp_path / "papers.json")
+    a = Storage(json_path)
+    b = Storage(json_path)
+    a.add(_paper(0))
+    assert b.get_all() == []
+
+def _worker(json_path, journal, n):
+    store = Storage(json_path, journal=journal, shared=True, fsync="never")
+    for _ in range(n):
+        store.record_access("arxiv:0")
+    store.close()
+
+# 5. 複数プロセスからの同時アクセス記録が失われない
+@pytest.mark.skipif(sys.platform == "win32", reason="fcntl is unavailable")
+@pytest.mark.parametrize("journal", [False, True])
+def test_shared_multiprocess_access_counts(tmp_path, journal):
+    json_path = str(tmp_path / "papers.json")
+    Storage(json_path).add(_paper(0))
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker, args=(json_path, journal, 25)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    assert Storage(json_path, journal=journal).get_access_count("arxiv:0") == 100